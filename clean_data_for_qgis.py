@@ -4,11 +4,57 @@ Data Cleaning Script for QGIS Import
 Filters and prepares the scraped data for optimal QGIS analysis
 """
 
+import numpy as np
 import pandas as pd
 import sys
 import os
 from datetime import datetime
 
+from src.utils.common import CSV_DTYPES as MARKET_CSV_DTYPES, find_latest_file, write_market_csv
+
+# Prefer the multithreaded Arrow CSV reader when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+# Column dtypes for the analysis CSV; everything else is left to inference
+CSV_DTYPES = {col: MARKET_CSV_DTYPES[col] for col in (
+    'place_id', 'name', 'category', 'sub_category', 'is_operational', 'review_count',
+    'rating', 'latitude', 'longitude', 'search_zone', 'timestamp'
+)}
+
+# Competitor sub-categories worth keeping for the wellness hub analysis
+RELEVANT_COMPETITOR_TYPES = ['Clinic_Only', 'Clinic+Grooming', 'Grooming_Only',
+                             'Pet_Hotel', 'Emergency_Hospital']
+
+# Impact radius (meters) per competitor sub-category, used for QGIS buffer zones
+COMPETITOR_BUFFER_RADII = {
+    'Clinic+Grooming': 3000,  # Full service = largest impact
+    'Emergency_Hospital': 3000,
+    'Clinic_Only': 2000,
+    'Grooming_Only': 1500,
+    'Pet_Hotel': 1500
+}
+
+def read_market_csv(input_file):
+    """Load an analysis CSV with the fixed column dtypes."""
+    if pacsv is None:
+        return pd.read_csv(input_file, dtype=CSV_DTYPES, engine='c')
+    
+    # Keep timestamps as text so they are written back exactly as scraped
+    table = pacsv.read_csv(
+        input_file,
+        convert_options=pacsv.ConvertOptions(
+            column_types={'timestamp': pa.string()},
+            strings_can_be_null=True
+        )
+    )
+    df = table.to_pandas()
+    return df.astype({col: dtype for col, dtype in CSV_DTYPES.items() if col in df.columns})
+
+
 def clean_market_data(input_file, output_file=None):
     """Clean and filter market analysis data for QGIS."""
     
@@ -17,76 +63,86 @@ def clean_market_data(input_file, output_file=None):
     
     # Load data
     print(f"\n📁 Loading: {input_file}")
-    df = pd.read_csv(input_file)
+    df = read_market_csv(input_file)
     original_count = len(df)
     print(f"   Original records: {original_count}")
     
+    # Steps 1-3 only narrow a single row mask; the filtered frame is
+    # materialized once at the end instead of being copied after every step
+    
     # 1. Remove duplicates based on place_id
-    df = df.drop_duplicates(subset=['place_id'])
-    print(f"   After deduplication: {len(df)} (-{original_count - len(df)} duplicates)")
+    keep = ~df['place_id'].duplicated().to_numpy()
+    remaining = int(keep.sum())
+    print(f"   After deduplication: {remaining} (-{original_count - remaining} duplicates)")
     
     # 2. Filter by operational status
     if 'is_operational' in df.columns:
-        operational_before = len(df)
-        df = df[df['is_operational'] == True]
-        print(f"   After operational filter: {len(df)} (-{operational_before - len(df)} closed)")
+        operational_before = remaining
+        keep &= (df['is_operational'] == True).to_numpy(dtype=bool, na_value=False)
+        remaining = int(keep.sum())
+        print(f"   After operational filter: {remaining} (-{operational_before - remaining} closed)")
     
     # 3. Enhanced category-specific filtering
     print("\n🔍 Applying category-specific filters...")
     
-    # For competitors - keep only relevant sub-categories
-    competitor_mask = df['category'] == 'Competitor'
-    relevant_competitor_types = ['Clinic_Only', 'Clinic+Grooming', 'Grooming_Only', 
-                                'Pet_Hotel', 'Emergency_Hospital']
-    df.loc[competitor_mask, 'keep'] = df.loc[competitor_mask, 'sub_category'].isin(relevant_competitor_types)
-    
-    # For affluence proxies - filter by review count (popularity indicator)
-    affluence_mask = df['category'] == 'Affluence_Proxy'
-    df.loc[affluence_mask, 'keep'] = df.loc[affluence_mask, 'review_count'] >= 10
-    
-    # For lifestyle proxies - keep all (already filtered by script)
-    lifestyle_mask = df['category'] == 'Lifestyle_Proxy'
-    df.loc[lifestyle_mask, 'keep'] = True
-    
-    # Apply the filter
-    filtered_df = df[df['keep'] == True].drop(columns=['keep'])
-    print(f"   After category filters: {len(filtered_df)} (-{len(df) - len(filtered_df)} low-relevance)")
+    # Keep relevant competitors, popular affluence proxies (review count as
+    # popularity indicator) and all lifestyle proxies
+    category = df['category']
+    keep &= (
+        ((category == 'Competitor') &
+         df['sub_category'].isin(RELEVANT_COMPETITOR_TYPES)) |
+        ((category == 'Affluence_Proxy') & (df['review_count'] >= 10)) |
+        (category == 'Lifestyle_Proxy')
+    ).to_numpy(dtype=bool, na_value=False)
+    filtered_df = df[keep].copy()
+    print(f"   After category filters: {len(filtered_df)} (-{remaining - len(filtered_df)} low-relevance)")
     
     # 4. Add analysis columns
     print("\n📊 Adding analysis columns...")
     
     # Popularity score (normalized review count * rating)
-    max_reviews = filtered_df['review_count'].max()
+    review_counts = filtered_df['review_count'].to_numpy(dtype=np.float32, na_value=np.nan)
+    # Private copy of the ratings so missing ones can default to 3.0 in place
+    ratings = filtered_df['rating'].to_numpy(dtype=np.float32, na_value=np.nan, copy=True)
+    np.nan_to_num(ratings, copy=False, nan=3.0)
+    max_reviews = np.nanmax(review_counts) if len(review_counts) else np.nan
     if max_reviews > 0:
-        filtered_df['popularity_score'] = (
-            (filtered_df['review_count'] / max_reviews) * 
-            filtered_df['rating'].fillna(3.0)
-        ).round(2)
+        filtered_df['popularity_score'] = np.round(
+            (review_counts / max_reviews) * ratings, 2
+        ).astype(np.float32)
     
     # Competition intensity zones (for competitors)
-    if 'Competitor' in filtered_df['category'].values:
+    # Categorical equality compares the integer codes, so this is one pass
+    competitor_mask = (filtered_df['category'] == 'Competitor').to_numpy()
+    if competitor_mask.any():
         # This will be used in QGIS to create buffer zones
-        filtered_df.loc[filtered_df['category'] == 'Competitor', 'buffer_radius_m'] = \
-            filtered_df.loc[filtered_df['category'] == 'Competitor', 'sub_category'].map({
-                'Clinic+Grooming': 3000,  # Full service = largest impact
-                'Emergency_Hospital': 3000,
-                'Clinic_Only': 2000,
-                'Grooming_Only': 1500,
-                'Pet_Hotel': 1500
-            })
+        sub_categories = filtered_df['sub_category'].cat.categories
+        # One radius slot per category code; the trailing NaN slot is what
+        # code -1 (missing sub_category) gathers
+        radii = np.full(len(sub_categories) + 1, np.nan)
+        for sub_cat, radius in COMPETITOR_BUFFER_RADII.items():
+            if sub_cat in sub_categories:
+                radii[sub_categories.get_loc(sub_cat)] = radius
+        sub_codes = filtered_df['sub_category'].cat.codes.to_numpy()
+        filtered_df['buffer_radius_m'] = np.where(competitor_mask, radii[sub_codes], np.nan)
     
     # 5. Sort for better organization
-    filtered_df = filtered_df.sort_values(
-        ['category', 'sub_category', 'popularity_score'],
-        ascending=[True, True, False]
-    )
+    # Category codes follow the sorted category order; missing values
+    # (code -1) are moved to the end like sort_values' na_position='last'
+    sort_keys = []
+    if 'popularity_score' in filtered_df.columns:
+        sort_keys.append(-filtered_df['popularity_score'].to_numpy(dtype=np.float64))
+    for col in ('sub_category', 'category'):
+        codes = filtered_df[col].cat.codes.to_numpy()
+        sort_keys.append(np.where(codes < 0, len(filtered_df[col].cat.categories), codes))
+    filtered_df = filtered_df.iloc[np.lexsort(sort_keys)]
     
     # 6. Save cleaned data
     if output_file is None:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = f'jakarta_pet_market_CLEAN_{timestamp}.csv'
     
-    filtered_df.to_csv(output_file, index=False)
+    write_market_csv(filtered_df, output_file)
     
     # 7. Generate summary report
     print("\n📈 Cleaning Summary:")
@@ -95,14 +151,16 @@ def clean_market_data(input_file, output_file=None):
     print(f"   Records: {original_count} → {len(filtered_df)} ({len(filtered_df)/original_count*100:.1f}% retained)")
     
     print("\n📊 Category Breakdown:")
-    for cat in filtered_df['category'].unique():
-        cat_df = filtered_df[filtered_df['category'] == cat]
+    for cat, cat_df in filtered_df.groupby('category', observed=True, sort=False):
         print(f"\n   {cat} ({len(cat_df)} locations):")
         
-        # Sub-category breakdown
-        for sub_cat, count in cat_df['sub_category'].value_counts().items():
-            avg_rating = cat_df[cat_df['sub_category'] == sub_cat]['rating'].mean()
-            avg_reviews = cat_df[cat_df['sub_category'] == sub_cat]['review_count'].mean()
+        # Sub-category breakdown (count and averages in a single grouped pass)
+        sub_stats = cat_df.groupby('sub_category', observed=True, sort=False).agg(
+            count=('place_id', 'size'),
+            avg_rating=('rating', 'mean'),
+            avg_reviews=('review_count', 'mean')
+        ).sort_values('count', ascending=False)
+        for sub_cat, count, avg_rating, avg_reviews in sub_stats.itertuples():
             print(f"      {sub_cat}: {count} (avg rating: {avg_rating:.1f}, avg reviews: {avg_reviews:.0f})")
     
     # 8. QGIS import instructions
@@ -125,14 +183,12 @@ def main():
     """Main entry point for command line usage."""
     if len(sys.argv) < 2:
         # Find the most recent analysis file
-        import glob
-        files = glob.glob('jakarta_pet_market_analysis_*.csv')
-        if not files:
+        input_file = find_latest_file('jakarta_pet_market_analysis_')
+        if input_file is None:
             print("❌ No analysis files found.")
             print("Usage: python clean_data_for_qgis.py <input_file.csv>")
             return
         
-        input_file = max(files)  # Most recent
         print(f"No file specified, using most recent: {input_file}")
     else:
         input_file = sys.argv[1]
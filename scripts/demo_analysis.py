@@ -5,29 +5,35 @@ Tests with a small subset to verify functionality
 """
 
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.common import write_csv_rows
 
 # Load environment variables
 load_dotenv()
 
 # Create a small test zone (Kemang area only)
-test_zones = pd.DataFrame([{
+test_zones = [{
     'zone_name': 'Kemang_Test',
     'latitude': -6.2600,
     'longitude': 106.8130,
     'radius': 5000
-}])
-test_zones.to_csv('test_zones.csv', index=False)
+}]
+write_csv_rows('test_zones.csv', test_zones)
 
 # Create limited test queries (just a few key searches)
-test_queries = pd.DataFrame([
+test_queries = [
     {'keyword': 'klinik hewan', 'category': 'Competitor', 'sub_category': 'Clinic_General'},
     {'keyword': 'pet grooming', 'category': 'Competitor', 'sub_category': 'Grooming_Only'},
     {'keyword': 'Ranch Market', 'category': 'Affluence_Proxy', 'sub_category': 'Premium_Supermarket'},
     {'keyword': 'pet cafe', 'category': 'Lifestyle_Proxy', 'sub_category': 'Pet_Cafe'},
-])
-test_queries.to_csv('test_queries.csv', index=False)
+]
+write_csv_rows('test_queries.csv', test_queries)
 
 print("📊 Demo Analysis Configuration")
 print("=" * 40)
@@ -43,7 +49,7 @@ print("Estimated time: ~2 minutes")
 
 # Show the searches that will be performed
 print("\n🔍 Searches to be performed:")
-for _, query in test_queries.iterrows():
+for query in test_queries:
     print(f"- {query['keyword']} ({query['sub_category']})")
 
 print("\n✅ Demo files created!")
@@ -6,14 +6,31 @@ Perfect for testing before running comprehensive analysis
 
 import os
 import sys
+import tempfile
+from pathlib import Path
 from dotenv import load_dotenv
 import pandas as pd
 
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
 # Load environment variables
 load_dotenv()
 
-def create_targeted_files(area=None, category=None):
-    """Create targeted search files based on user selection."""
+
+def _load_queries():
+    """Parse the comprehensive query list with categorical category columns."""
+    return pd.read_csv(
+        'queries_comprehensive.csv',
+        dtype={'category': 'category', 'sub_category': 'category'}
+    )
+
+
+def create_targeted_files(area=None, category=None, output_dir='.'):
+    """Create targeted search files in output_dir based on user selection."""
+    zones_file = os.path.join(output_dir, 'search_zones_targeted.csv')
+    queries_file = os.path.join(output_dir, 'queries_targeted.csv')
     
     # Define available options
     areas = {
@@ -64,12 +81,12 @@ def create_targeted_files(area=None, category=None):
             'longitude': lon,
             'radius': radius
         }])
-        zones_df.to_csv('search_zones_targeted.csv', index=False)
+        zones_df.to_csv(zones_file, index=False)
         print(f"✅ Created search zone: {zone_name}")
     
     # Create targeted queries file
     if category in categories:
-        full_queries = pd.read_csv('queries_comprehensive.csv')
+        full_queries = _load_queries()
         
         if category == '1':  # Competitors only
             filtered = full_queries[full_queries['category'] == 'Competitor']
@@ -80,10 +97,10 @@ def create_targeted_files(area=None, category=None):
         else:  # All
             filtered = full_queries
         
-        filtered.to_csv('queries_targeted.csv', index=False)
+        filtered.to_csv(queries_file, index=False)
         print(f"✅ Created query set: {categories[category]} ({len(filtered)} queries)")
     
-    return 'search_zones_targeted.csv', 'queries_targeted.csv'
+    return zones_file, queries_file
 
 
 def main():
@@ -96,52 +113,39 @@ def main():
         print("❌ Error: Please set your API key in .env file first!")
         return
     
-    # Create targeted files
-    zones_file, queries_file = create_targeted_files()
-    
-    # Estimate cost
-    zones_df = pd.read_csv(zones_file)
-    queries_df = pd.read_csv(queries_file)
-    estimated_searches = len(zones_df) * len(queries_df)
-    estimated_cost = estimated_searches * 0.017  # Rough estimate
-    
-    print(f"\n💰 Estimated cost: ${estimated_cost:.2f}")
-    print(f"⏱️  Estimated time: {estimated_searches * 2 / 60:.0f} minutes")
-    
-    proceed = input("\n🚀 Run analysis? (y/n): ").strip().lower()
-    
-    if proceed == 'y':
-        # Run the comprehensive script with targeted files
-        print("\n🔄 Starting analysis...")
-        import subprocess
-        
-        # Temporarily rename files
-        os.rename(zones_file, 'search_zones.csv.tmp')
-        os.rename(queries_file, 'queries_comprehensive.csv.tmp')
+    # Targeted files only live for this run
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Create targeted files
+        zones_file, queries_file = create_targeted_files(output_dir=work_dir)
         
-        if os.path.exists('search_zones.csv'):
-            os.rename('search_zones.csv', 'search_zones.csv.bak')
-        if os.path.exists('queries_comprehensive.csv'):
-            os.rename('queries_comprehensive.csv', 'queries_comprehensive.csv.bak')
+        # Estimate cost
+        zones_df = pd.read_csv(zones_file)
+        queries_df = pd.read_csv(queries_file)
+        estimated_searches = len(zones_df) * len(queries_df)
+        estimated_cost = estimated_searches * 0.017  # Rough estimate
         
-        os.rename('search_zones.csv.tmp', 'search_zones.csv')
-        os.rename('queries_comprehensive.csv.tmp', 'queries_comprehensive.csv')
+        print(f"\n💰 Estimated cost: ${estimated_cost:.2f}")
+        print(f"⏱️  Estimated time: {estimated_searches * 2 / 60:.0f} minutes")
         
-        # Run analysis
-        subprocess.run([sys.executable, 'main_comprehensive.py'])
+        proceed = input("\n🚀 Run analysis? (y/n): ").strip().lower()
         
-        # Restore original files
-        os.rename('search_zones.csv', zones_file)
-        os.rename('queries_comprehensive.csv', queries_file)
-        
-        if os.path.exists('search_zones.csv.bak'):
-            os.rename('search_zones.csv.bak', 'search_zones.csv')
-        if os.path.exists('queries_comprehensive.csv.bak'):
-            os.rename('queries_comprehensive.csv.bak', 'queries_comprehensive.csv')
-        
-        print("\n✅ Analysis complete! Check the output CSV file.")
-    else:
-        print("\n❌ Analysis cancelled.")
+        if proceed == 'y':
+            # Run the comprehensive analysis in-process with the targeted files
+            print("\n🔄 Starting analysis...")
+            from src.runners.main_comprehensive import main as run_comprehensive_analysis
+            
+            try:
+                output_file = run_comprehensive_analysis(
+                    zones_file=zones_file, queries_file=queries_file
+                )
+            except Exception as e:
+                print(f"\n❌ Analysis failed: {e}")
+                return
+            
+            if output_file:
+                print(f"\n✅ Analysis complete! Check the output CSV file: {output_file}")
+        else:
+            print("\n❌ Analysis cancelled.")
 
 
 if __name__ == "__main__":
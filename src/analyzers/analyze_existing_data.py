@@ -5,8 +5,26 @@ Analyze existing Jakarta pet market dataset before enhancement
 import pandas as pd
 import logging
 
+# Prefer the multithreaded Arrow CSV parser when pyarrow is installed
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
+# Only the columns the analysis touches, with explicit dtypes to skip inference
+USECOLS = ['place_id', 'category', 'sub_category', 'latitude', 'longitude', 'search_zone']
+DTYPES = {
+    'place_id': 'string',
+    'category': 'category',
+    'sub_category': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'search_zone': 'category',
+}
+
 def analyze_existing_data():
     """Analyze the existing dataset structure and content"""
     
@@ -14,44 +32,55 @@ def analyze_existing_data():
     file_path = 'jakarta_pet_market_CLEAN_20250805_102308.csv'
     logging.info(f"Loading existing data from {file_path}")
     
-    df = pd.read_csv(file_path)
+    columns = pd.read_csv(file_path, nrows=0).columns
+    df = pd.read_csv(file_path, usecols=USECOLS, dtype=DTYPES, engine=CSV_ENGINE)
     
     # Basic stats
     logging.info(f"\nTotal records: {len(df)}")
     
-    # Category breakdown
+    # Category and sub-category counts from a single grouped pass; missing
+    # sub-categories are kept so competitor totals include them
+    cat_sub_counts = df.groupby(
+        ['category', 'sub_category'], observed=True, sort=False, dropna=False
+    ).size()
+    
+    # Category breakdown; rows without a category are left out, as
+    # value_counts() would
     logging.info("\nCategory breakdown:")
-    category_counts = df['category'].value_counts()
+    has_category = cat_sub_counts.index.get_level_values('category').notna()
+    category_counts = cat_sub_counts[has_category].groupby(
+        level='category', observed=True, sort=False
+    ).sum().sort_values(ascending=False)
     for cat, count in category_counts.items():
         logging.info(f"  {cat}: {count}")
     
     # Sub-category breakdown for competitors
-    competitor_df = df[df['category'] == 'Competitor']
-    logging.info(f"\nCompetitor sub-categories ({len(competitor_df)} total):")
-    comp_subcats = competitor_df['sub_category'].value_counts()
-    for subcat, count in comp_subcats.items():
+    if 'Competitor' in category_counts.index:
+        comp_subcats = cat_sub_counts.loc['Competitor'].sort_values(ascending=False)
+    else:
+        comp_subcats = pd.Series(dtype='int64')
+    logging.info(f"\nCompetitor sub-categories ({comp_subcats.sum()} total):")
+    for subcat, count in comp_subcats[comp_subcats.index.notna()].items():
         logging.info(f"  {subcat}: {count}")
     
-    # Unique search zones
-    zones = df['search_zone'].unique()
-    logging.info(f"\nUnique search zones: {len(zones)}")
-    for zone in sorted(zones):
-        zone_data = df[df['search_zone'] == zone]
-        center_lat = zone_data['latitude'].mean()
-        center_lng = zone_data['longitude'].mean()
+    # Zone centers from a single grouped pass
+    zone_info = (
+        df.groupby('search_zone', sort=True, observed=True)[['latitude', 'longitude']]
+        .mean()
+        .rename(columns={'latitude': 'center_latitude', 'longitude': 'center_longitude'})
+        .rename_axis('zone_name')
+        .reset_index()
+    )
+    logging.info(f"\nUnique search zones: {len(zone_info)}")
+    for zone, center_lat, center_lng in zone_info.itertuples(index=False):
         logging.info(f"  {zone}: center at ({center_lat:.4f}, {center_lng:.4f})")
     
     # Save zone info for later use
-    zone_info = pd.DataFrame({
-        'zone_name': zones,
-        'center_latitude': [df[df['search_zone'] == z]['latitude'].mean() for z in zones],
-        'center_longitude': [df[df['search_zone'] == z]['longitude'].mean() for z in zones]
-    })
     zone_info.to_csv('existing_zones_info.csv', index=False)
     logging.info("\nZone information saved to existing_zones_info.csv")
     
     # Column structure
-    logging.info(f"\nColumns ({len(df.columns)}): {', '.join(df.columns)}")
+    logging.info(f"\nColumns ({len(columns)}): {', '.join(columns)}")
     
     return df
 
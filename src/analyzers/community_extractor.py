@@ -6,19 +6,34 @@ Uses Indonesian language settings and focuses on community-relevant categories.
 """
 
 import os
+import re
+import sys
 import csv
 import time
 import logging
 import hashlib
 from datetime import datetime
 from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from collections import Counter, defaultdict
+from pathlib import Path
 
 from dotenv import load_dotenv
 import googlemaps
 import pandas as pd
 from tqdm import tqdm
 
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import ResponseCache, TokenBucket, cancelling_executor, load_saved_place_ids
+
+# Prefer the multithreaded Arrow CSV reader when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,13 +43,54 @@ logging.basicConfig(
 # Load environment variables
 load_dotenv()
 
+# Concurrent API requests in flight; the shared TokenBucket keeps the
+# overall request rate at the same budget as the old serial loop
+MAX_WORKERS = 16
 
-def load_existing_place_ids(existing_dataset_path='jakarta_pet_market_CLEAN_20250805_102308.csv') -> Set[str]:
-    """Load existing place_ids to avoid duplicates."""
+# Output rows are block-buffered, and flushed every FLUSH_EVERY rows so an
+# interrupted run can be resumed from what reached the file
+WRITE_BUFFER_SIZE = 1 << 20
+FLUSH_EVERY = 100
+
+# Stop paginating a search once more than this share of a page is already
+# in the existing dataset
+DUPLICATE_PAGE_RATIO = 0.9
+
+# Exact column order matching existing dataset
+OUTPUT_COLUMNS = (
+    'place_id', 'name', 'category', 'sub_category', 'latitude', 'longitude',
+    'address', 'vicinity', 'rating', 'review_count', 'website', 'phone',
+    'price_level', 'types', 'is_operational', 'search_zone', 'search_keyword',
+    'is_open_now', 'timestamp', 'popularity_score', 'buffer_radius_m'
+)
+
+
+def place_id_hash(place_id: str) -> int:
+    """64-bit blake2b digest of a place_id, used as the compact dedup key."""
+    return int.from_bytes(
+        hashlib.blake2b(place_id.encode('utf-8'), digest_size=8).digest(), 'little'
+    )
+
+
+def load_existing_place_ids(existing_dataset_path='jakarta_pet_market_CLEAN_20250805_102308.csv') -> Set[int]:
+    """Load existing place_ids (as place_id_hash values) to avoid duplicates."""
     existing_ids = set()
     try:
-        df = pd.read_csv(existing_dataset_path)
-        existing_ids = set(df['place_id'].dropna().astype(str))
+        # Only the place_id column is parsed
+        if pacsv is not None:
+            table = pacsv.read_csv(
+                existing_dataset_path,
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=['place_id'],
+                    column_types={'place_id': pa.string()},
+                    strings_can_be_null=True
+                )
+            )
+            place_ids = [pid for pid in table.column('place_id').to_pylist() if pid is not None]
+        else:
+            df = pd.read_csv(existing_dataset_path, usecols=['place_id'], dtype={'place_id': str})
+            place_ids = df['place_id'].dropna()
+        existing_ids = {place_id_hash(pid) for pid in place_ids}
         logging.info(f"Loaded {len(existing_ids)} existing place_ids for deduplication")
     except Exception as e:
         logging.warning(f"Could not load existing dataset for deduplication: {e}")
@@ -94,14 +150,16 @@ def get_community_search_queries():
 
 def load_search_zones(zones_file='existing_zones_info.csv'):
     """Load search zones from CSV file."""
-    zones = []
     try:
         df = pd.read_csv(zones_file)
-        for _, row in df.iterrows():
-            zones.append({
-                'name': row['zone_name'],
-                'location': (float(row['center_latitude']), float(row['center_longitude']))
-            })
+        zones = [
+            {'name': name, 'location': (lat, lng)}
+            for name, lat, lng in zip(
+                df['zone_name'].tolist(),
+                df['center_latitude'].to_numpy(dtype=float).tolist(),
+                df['center_longitude'].to_numpy(dtype=float).tolist()
+            )
+        ]
         logging.info(f"Loaded {len(zones)} search zones from {zones_file}")
         return zones
     except Exception as e:
@@ -116,15 +174,59 @@ def load_search_zones(zones_file='existing_zones_info.csv'):
         ]
 
 
-def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, radius, existing_ids, rate_limit=8):
-    """Fetch places for a specific zone and keyword combination using Indonesian language."""
+def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, radius, existing_ids, rate_limit=8, limiter=None, cache=None):
+    """Fetch places for a specific zone and keyword combination using Indonesian language.
+    
+    Returns (places, api_calls, duplicates), where duplicates counts results
+    skipped because they are already in the existing dataset. Pagination stops
+    early once a page is dominated by such places, which saves the
+    next_page_token delay and API call.
+    """
     places = []
     api_calls = 0
+    total_duplicates = 0
     max_pages = 3  # Limit to prevent excessive API usage
+    zone_name = zone['name']
+    
+    def ingest(results):
+        """Keep places not in the existing dataset; return (new, duplicate) counts."""
+        nonlocal total_duplicates
+        new = duplicates = 0
+        append = places.append
+        for place in results:
+            place_id = place.get('place_id')
+            if not place_id:
+                continue
+            if place_id_hash(place_id) in existing_ids:
+                duplicates += 1
+                continue
+            types = place.get('types') or []
+            place['search_zone'] = zone_name
+            place['search_keyword'] = keyword
+            place['search_types'] = types
+            # Lowered once here so relevance checks don't repeat it per query
+            place['name_lower'] = place.get('name', '').lower()
+            place['types_lower'] = [t.lower() for t in types]
+            append(place)
+            new += 1
+        total_duplicates += duplicates
+        return new, duplicates
+    
+    # Raw result pages are cached before the existing_ids filter, which can
+    # change between runs
+    cache_args = (zone_name, zone['location'], keyword, radius, 'id')
+    cached_pages = cache.get('nearby', *cache_args) if cache is not None else None
+    if cached_pages is not None:
+        for results in cached_pages:
+            ingest(results)
+        return places, api_calls, total_duplicates
     
     try:
         # Rate limiting - more conservative for community search
-        time.sleep(1.2 / rate_limit)
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.2 / rate_limit)
         
         # Use Indonesian language setting for better local results
         response = gmaps.places_nearby(
@@ -133,62 +235,86 @@ def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, radius, existing_ids
             keyword=keyword,
             language='id'  # Indonesian language setting
         )
+    except Exception as e:
+        logging.error(f"Error fetching places for '{keyword}' in {zone['name']}: {e}")
+        return places, api_calls, total_duplicates
+    
+    # Result pages of this search; only cached when every page was fetched
+    pages = []
+    complete = True
+    while True:
         api_calls += 1
+        results = response.get('results') or []
+        pages.append(results)
+        new, duplicates = ingest(results)
         
-        if 'results' in response:
-            # Filter out existing places immediately
-            for place in response['results']:
-                place_id = place.get('place_id')
-                if place_id and place_id not in existing_ids:
-                    place['search_zone'] = zone['name']
-                    place['search_keyword'] = keyword
-                    place['search_types'] = place.get('types', [])
-                    places.append(place)
+        page_token = response.get('next_page_token')
+        if not page_token or len(pages) >= max_pages:
+            break
         
-        # Handle pagination
-        page_count = 1
-        while 'next_page_token' in response and page_count < max_pages:
-            time.sleep(2.5)  # Required delay for next_page_token
-            
-            try:
-                response = gmaps.places_nearby(
-                    page_token=response['next_page_token'],
-                    language='id'
-                )
-                api_calls += 1
-                page_count += 1
-                
-                if 'results' in response:
-                    for place in response['results']:
-                        place_id = place.get('place_id')
-                        if place_id and place_id not in existing_ids:
-                            place['search_zone'] = zone['name']
-                            place['search_keyword'] = keyword
-                            place['search_types'] = place.get('types', [])
-                            places.append(place)
-                        
-            except Exception as e:
-                logging.warning(f"Pagination error for '{keyword}' in {zone['name']}: {e}")
-                break
+        # Not worth paging further when this page was (nearly) all known places.
+        # Whether that happens depends on the existing dataset, so the cut-short
+        # page set is not cached
+        if new == 0 or duplicates > DUPLICATE_PAGE_RATIO * (new + duplicates):
+            complete = False
+            break
+        
+        time.sleep(2.5)  # Required delay for next_page_token
+        try:
+            response = gmaps.places_nearby(page_token=page_token, language='id')
+        except Exception as e:
+            logging.warning(f"Pagination error for '{keyword}' in {zone['name']}: {e}")
+            complete = False
+            break
     
-    except Exception as e:
-        logging.error(f"Error fetching places for '{keyword}' in {zone['name']}: {e}")
+    if cache is not None and complete:
+        cache.set('nearby', pages, *cache_args)
     
-    return places, api_calls
+    return places, api_calls, total_duplicates
+
+
+# Place Details fields every row needs: location, status and the rating
+# inputs of the popularity score
+DETAILS_BASE_FIELDS = (
+    'place_id', 'name', 'formatted_address', 'geometry', 'vicinity',
+    'business_status', 'rating', 'user_ratings_total', 'price_level'
+)
+
+# Contact fields are billed at a higher SKU, so each category only asks for
+# the ones its analysis uses; is_open_now stays empty without opening_hours
+DETAILS_FIELDS_BY_CATEGORY = {
+    # Halls, places of worship and markets matter for where they are
+    'Community_Infrastructure': DETAILS_BASE_FIELDS,
+    # Stores and banks: whether they are open is the accessibility signal
+    'Middle_Class_Accessibility': DETAILS_BASE_FIELDS + ('opening_hours',),
+    # Schools and pharmacies: contact details for follow-up
+    'Family_Services': DETAILS_BASE_FIELDS + ('website', 'formatted_phone_number'),
+    'Value_Conscious_Retail': DETAILS_BASE_FIELDS + ('opening_hours', 'formatted_phone_number'),
+}
 
+# Categories without an entry above get every field the output can hold
+DETAILS_ALL_FIELDS = DETAILS_BASE_FIELDS + ('website', 'formatted_phone_number', 'opening_hours')
 
-def get_place_details_enhanced(gmaps, place_id, rate_limit=8):
-    """Get detailed information for a place with enhanced fields using Indonesian language."""
+
+def get_place_details_enhanced(gmaps, place_id, category, rate_limit=8, limiter=None, cache=None):
+    """Get detailed information for a place using Indonesian language.
+    
+    Only the fields listed for `category` in DETAILS_FIELDS_BY_CATEGORY are
+    requested.
+    """
+    fields = list(DETAILS_FIELDS_BY_CATEGORY.get(category, DETAILS_ALL_FIELDS))
+    cache_args = (place_id, ','.join(sorted(fields)), 'id')
+    
+    if cache is not None:
+        cached = cache.get('details', *cache_args)
+        if cached is not None:
+            return cached
+    
     try:
-        time.sleep(1.2 / rate_limit)
-        
-        # Request specific fields with Indonesian language
-        fields = [
-            'place_id', 'name', 'formatted_address', 'geometry',
-            'rating', 'user_ratings_total', 'website',
-            'opening_hours', 'formatted_phone_number', 'price_level',
-            'business_status', 'vicinity'
-        ]
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.2 / rate_limit)
         
         response = gmaps.place(
             place_id=place_id,
@@ -196,96 +322,114 @@ def get_place_details_enhanced(gmaps, place_id, rate_limit=8):
             language='id'  # Indonesian language setting
         )
         
-        return response.get('result', {})
+        result = response.get('result', {})
+        if result and cache is not None:
+            cache.set('details', result, *cache_args)
+        return result
     
     except Exception as e:
         logging.warning(f"Error fetching details for place_id '{place_id}': {e}")
         return {}
 
 
-def is_relevant_community_place(name, business_types, category):
-    """Filter to ensure we only get relevant community places."""
-    name_lower = name.lower()
-    types_lower = [t.lower() for t in business_types] if business_types else []
+# Relevance filter vocabularies, compiled once at import
+IRRELEVANT_TYPES = frozenset([
+    'parking', 'gas_station', 'atm', 'storage', 'warehouse',
+    'construction', 'industrial', 'loading_dock', 'airport',
+    'subway_station', 'train_station', 'embassy'
+])
+
+IRRELEVANT_NAME_RE = re.compile('|'.join(map(re.escape, [
+    'parking', 'tempat parkir', 'loading dock', 'gudang',
+    'konstruksi', 'industri', 'pabrik'
+])))
+
+
+def _keyword_re(words):
+    """Compile a substring alternation matching any of the given words."""
+    return re.compile('|'.join(map(re.escape, words)))
+
+
+# Category-specific name rules: (keep, mall_check). A name matching `keep` is
+# accepted outright; one matching `mall_check` is rejected when Google types
+# the place as a shopping mall. Every other name is accepted.
+CATEGORY_NAME_RULES = {
+    # Places of worship, then traditional markets
+    'Community_Infrastructure': (
+        _keyword_re(['masjid', 'gereja', 'vihara', 'pura', 'musholla']),
+        _keyword_re(['pasar', 'market'])
+    ),
+    # Convenience store chains and banks
+    'Middle_Class_Accessibility': (
+        _keyword_re(['indomaret', 'alfamart', 'circle k', 'bank', 'bri', 'bni', 'mandiri', 'bca']),
+        None
+    ),
+    # Schools and pharmacies
+    'Family_Services': (
+        _keyword_re(['sd', 'sekolah', 'tk', 'paud', 'apotek', 'pharmacy', 'kimia farma', 'guardian']),
+        None
+    ),
+    # Local eateries and laundry
+    'Value_Conscious_Retail': (
+        _keyword_re(['warung', 'warteg', 'rumah makan', 'padang', 'laundry', 'laundromat', 'cuci']),
+        None
+    ),
+}
+
+
+def is_relevant_community_place(name_lower, types_lower, category):
+    """Filter to ensure we only get relevant community places.
     
-    # Exclude clearly irrelevant places
-    irrelevant_types = [
-        'parking', 'gas_station', 'atm', 'storage', 'warehouse',
-        'construction', 'industrial', 'loading_dock', 'airport',
-        'subway_station', 'train_station', 'embassy'
-    ]
+    Takes the place name and its types already lowercased.
+    """
+    types_lower = frozenset(types_lower or ())
     
-    irrelevant_names = [
-        'parking', 'tempat parkir', 'loading dock', 'gudang',
-        'konstruksi', 'industri', 'pabrik'
-    ]
+    # Exclude clearly irrelevant places by type or name pattern
+    if not IRRELEVANT_TYPES.isdisjoint(types_lower):
+        return False
     
-    # Check if any irrelevant types match
-    for irrelevant_type in irrelevant_types:
-        if irrelevant_type in types_lower:
-            return False
-    
-    # Check if any irrelevant name patterns match
-    for pattern in irrelevant_names:
-        if pattern in name_lower:
-            return False
+    if IRRELEVANT_NAME_RE.search(name_lower):
+        return False
     
     # Additional category-specific filtering
-    if category == 'Community_Infrastructure':
-        # For religious places, ensure they are actual places of worship
-        if any(word in name_lower for word in ['masjid', 'gereja', 'vihara', 'pura', 'musholla']):
-            return True
-        # For traditional markets
-        if any(word in name_lower for word in ['pasar', 'market']):
-            return 'shopping_mall' not in types_lower  # Exclude modern malls
-            
-    elif category == 'Middle_Class_Accessibility':
-        # For convenience stores, check for known chains
-        if any(word in name_lower for word in ['indomaret', 'alfamart', 'circle k']):
-            return True
-        # For banks
-        if any(word in name_lower for word in ['bank', 'bri', 'bni', 'mandiri', 'bca']):
-            return True
-            
-    elif category == 'Family_Services':
-        # For schools
-        if any(word in name_lower for word in ['sd', 'sekolah', 'tk', 'paud']):
-            return True
-        # For pharmacies
-        if any(word in name_lower for word in ['apotek', 'pharmacy', 'kimia farma', 'guardian']):
-            return True
-            
-    elif category == 'Value_Conscious_Retail':
-        # For local eateries
-        if any(word in name_lower for word in ['warung', 'warteg', 'rumah makan', 'padang']):
-            return True
-        # For laundry
-        if any(word in name_lower for word in ['laundry', 'laundromat', 'cuci']):
-            return True
+    rules = CATEGORY_NAME_RULES.get(category)
+    if rules is None:
+        return True
+    
+    keep_re, mall_check_re = rules
+    if keep_re.search(name_lower):
+        return True
+    if mall_check_re is not None and mall_check_re.search(name_lower):
+        return 'shopping_mall' not in types_lower  # Exclude modern malls
     
     return True
 
 
 def calculate_popularity_score(rating, review_count):
     """Calculate a simple popularity score based on rating and review count."""
-    if not rating or not review_count:
+    if not (rating and review_count):
         return 0.0
     
     try:
         rating = float(rating)
-        review_count = int(review_count)
-        
-        # Simple popularity formula: normalize rating (0-1) * log-scaled review count
-        normalized_rating = (rating - 1) / 4  # Convert 1-5 scale to 0-1
-        log_reviews = min(1.0, review_count / 1000)  # Cap at 1000 reviews = 1.0
-        
-        return round(normalized_rating * log_reviews, 2)
-    except:
+        review_count = review_count if type(review_count) is int else int(review_count)
+    except (TypeError, ValueError):
         return 0.0
+    
+    # Simple popularity formula: normalized rating (1-5 scale to 0-1) *
+    # review count capped at 1000 reviews = 1.0
+    normalized_rating = (rating - 1) * 0.25
+    review_weight = review_count / 1000 if review_count < 1000 else 1.0
+    
+    return round(normalized_rating * review_weight, 2)
 
 
-def process_community_place_for_output(place_details, category, sub_category, search_info, search_types=None, radius=None):
-    """Process place details into the exact 21-column format matching existing dataset."""
+def process_community_place_for_output(place_details, category, sub_category, search_info, search_types=None, radius=None, run_timestamp=None):
+    """Process place details into a row tuple in OUTPUT_COLUMNS order (matching existing dataset).
+    
+    run_timestamp is the ISO timestamp shared by every row of one extraction run;
+    the current time is used when it is not given.
+    """
     name = place_details.get('name', '')
     
     # Use search_types from the initial search response
@@ -309,33 +453,37 @@ def process_community_place_for_output(place_details, category, sub_category, se
     review_count = place_details.get('user_ratings_total', 0)
     popularity_score = calculate_popularity_score(rating, review_count)
     
-    return {
-        'place_id': place_details.get('place_id', ''),
-        'name': name,
-        'category': category,
-        'sub_category': sub_category,
-        'latitude': lat,
-        'longitude': lng,
-        'address': place_details.get('formatted_address', ''),
-        'vicinity': place_details.get('vicinity', ''),
-        'rating': rating,
-        'review_count': review_count,
-        'website': place_details.get('website', ''),
-        'phone': place_details.get('formatted_phone_number', ''),
-        'price_level': price_level,
-        'types': ', '.join(business_types) if business_types else '',
-        'is_operational': is_operational,
-        'search_zone': search_info['zone'],
-        'search_keyword': search_info['keyword'],
-        'is_open_now': place_details.get('opening_hours', {}).get('open_now', ''),
-        'timestamp': datetime.now().isoformat(),
-        'popularity_score': popularity_score,
-        'buffer_radius_m': radius or ''
-    }
-
-
-def main():
-    """Main execution function for community extraction."""
+    return (
+        place_details.get('place_id', ''),                              # place_id
+        name,                                                           # name
+        category,                                                       # category
+        sub_category,                                                   # sub_category
+        lat,                                                            # latitude
+        lng,                                                            # longitude
+        place_details.get('formatted_address', ''),                     # address
+        place_details.get('vicinity', ''),                              # vicinity
+        rating,                                                         # rating
+        review_count,                                                   # review_count
+        place_details.get('website', ''),                               # website
+        place_details.get('formatted_phone_number', ''),                # phone
+        price_level,                                                    # price_level
+        ', '.join(business_types) if business_types else '',            # types
+        is_operational,                                                 # is_operational
+        search_info['zone'],                                            # search_zone
+        search_info['keyword'],                                         # search_keyword
+        place_details.get('opening_hours', {}).get('open_now', ''),     # is_open_now
+        run_timestamp or datetime.now().isoformat(),                    # timestamp
+        popularity_score,                                               # popularity_score
+        radius or ''                                                    # buffer_radius_m
+    )
+
+
+def main(resume_file=None):
+    """Main execution function for community extraction.
+    
+    Pass the output file of an interrupted run as `resume_file` to append to
+    it instead of starting over; places already written are skipped.
+    """
     print("🏘️  Community-Centered Locations Extractor for Jakarta")
     print("=" * 60)
     print("Extracting ONLY community infrastructure and services")
@@ -363,8 +511,32 @@ def main():
     print(f"📋 Existing places to avoid: {len(existing_ids)}")
     print()
     
-    # Dictionary to store unique places by place_id
-    unique_places = {}
+    # Rows are streamed to the output file as they are produced
+    run_started = datetime.now()
+    run_timestamp = run_started.isoformat()
+    
+    try:
+        if resume_file:
+            # The rows already in the file are the resume state; rows still
+            # buffered when a run died were never written and are fetched again
+            output_file = resume_file
+            written_ids = load_saved_place_ids(output_file)
+            output = open(output_file, 'a', buffering=WRITE_BUFFER_SIZE, newline='', encoding='utf-8')
+            print(f"♻️  Resuming {output_file}: {len(written_ids)} places already saved")
+            print()
+        else:
+            output_file = f'jakarta_community_locations_{run_started.strftime("%Y%m%d_%H%M%S")}.csv'
+            written_ids = set()
+            output = open(output_file, 'w', buffering=WRITE_BUFFER_SIZE, newline='', encoding='utf-8')
+    except (OSError, csv.Error) as e:
+        logging.error(f"Error saving results: {e}")
+        return
+    writer = csv.writer(output)
+    if not resume_file:
+        writer.writerow(OUTPUT_COLUMNS)
+    
+    category_counts = Counter()
+    sub_category_counts = Counter()
     
     # Counters for API calls and statistics
     nearby_search_calls = 0
@@ -372,59 +544,96 @@ def main():
     total_found = 0
     duplicates_avoided = 0
     
-    # Process each zone-query combination
-    print("🔍 Searching for community places...")
+    # Same average budget as the old per-call sleep of 1.2 / rate_limit seconds
+    limiter = TokenBucket(rate=8 / 1.2)
+    cache = ResponseCache()
+    zone_places = defaultdict(int)
+    
+    # One dedup set for the existing dataset, places saved before a resume
+    # and places queued this run
+    seen = set(existing_ids)
+    seen.update(map(place_id_hash, written_ids))
     
-    for zone in tqdm(zones, desc="Processing zones"):
-        zone_places = 0
+    # Relevant new places waiting for details: place_id -> (zone, query, search_types)
+    pending = {}
+    
+    with output, cancelling_executor(MAX_WORKERS) as executor:
+        # Phase 1: run every zone-query search concurrently and collect the
+        # first relevant hit for each new place_id. Results are consumed in
+        # submission order so that hit does not depend on thread timing
+        print("🔍 Searching for community places...")
+        
+        search_futures = [
+            (zone, query, executor.submit(
+                fetch_places_for_zone_and_keyword,
+                gmaps, query['keyword'], zone, query['radius'], existing_ids,
+                rate_limit=8, limiter=limiter, cache=cache
+            ))
+            for zone in zones
+            for query in community_queries
+        ]
+        
+        for zone, query, future in tqdm(search_futures, total=len(search_futures), desc="Processing searches"):
+            places, api_calls, duplicates = future.result()
+            nearby_search_calls += api_calls
+            duplicates_avoided += duplicates
+            
+            for place in places:
+                # Search results are already free of existing places; skip any
+                # place queued by an earlier search
+                key = place_id_hash(place['place_id'])
+                if key not in seen and is_relevant_community_place(
+                    place['name_lower'],
+                    place['types_lower'],
+                    query['category']
+                ):
+                    seen.add(key)
+                    pending[place['place_id']] = (zone, query, place['search_types'])
         
-        for query in community_queries:
-            keyword = query['keyword']
+        # Phase 2: fetch details for all queued places concurrently; rows are
+        # written here in queue order so the output is stable
+        detail_futures = {
+            place_id: executor.submit(
+                get_place_details_enhanced,
+                gmaps, place_id, query['category'],
+                rate_limit=8, limiter=limiter, cache=cache
+            )
+            for place_id, (_, query, _) in pending.items()
+        }
+        place_details_calls = len(detail_futures)
+        
+        for place_id, future in tqdm(detail_futures.items(), total=len(detail_futures), desc="Fetching details"):
+            place_details = future.result()
+            if not place_details:
+                continue
+            
+            zone, query, search_types = pending[place_id]
             category = query['category']
             sub_category = query['sub_category']
-            radius = query['radius']
+            search_info = {
+                'zone': zone['name'],
+                'keyword': query['keyword']
+            }
             
-            # Fetch places for this zone-keyword combination
-            places, api_calls = fetch_places_for_zone_and_keyword(
-                gmaps, keyword, zone, radius, existing_ids, rate_limit=8
+            place_row = process_community_place_for_output(
+                place_details, category, sub_category, search_info,
+                search_types, query['radius'], run_timestamp
             )
-            nearby_search_calls += api_calls
             
-            # Process each place
-            for place in places:
-                place_id = place.get('place_id')
-                
-                # Skip if already processed or in existing dataset
-                if place_id and place_id not in unique_places and place_id not in existing_ids:
-                    # Check if it's a relevant community place
-                    if is_relevant_community_place(
-                        place.get('name', ''),
-                        place.get('search_types', []),
-                        category
-                    ):
-                        # Get detailed information
-                        place_details = get_place_details_enhanced(gmaps, place_id, rate_limit=8)
-                        place_details_calls += 1
-                        
-                        if place_details:
-                            # Process and store place information
-                            search_info = {
-                                'zone': zone['name'],
-                                'keyword': keyword
-                            }
-                            
-                            place_info = process_community_place_for_output(
-                                place_details, category, sub_category, search_info,
-                                place.get('search_types', []), radius
-                            )
-                            
-                            unique_places[place_id] = place_info
-                            zone_places += 1
-                            total_found += 1
-                elif place_id in existing_ids:
-                    duplicates_avoided += 1
-        
-        logging.info(f"Zone {zone['name']}: Found {zone_places} new community places")
+            writer.writerow(place_row)
+            category_counts[category] += 1
+            sub_category_counts[sub_category] += 1
+            zone_places[zone['name']] += 1
+            total_found += 1
+            if total_found % FLUSH_EVERY == 0:
+                output.flush()
+    
+    for zone in zones:
+        logging.info(f"Zone {zone['name']}: Found {zone_places[zone['name']]} new community places")
+    
+    # Cached details cost nothing; nearby calls are only counted on a miss
+    place_details_calls -= cache.hits['details']
+    cache.close()
     
     print()
     print("=" * 60)
@@ -435,6 +644,7 @@ def main():
     print(f"📡 Total API calls made: {nearby_search_calls + place_details_calls}")
     print(f"   - Nearby Search calls: {nearby_search_calls}")
     print(f"   - Place Details calls: {place_details_calls}")
+    print(f"💾 Cache hits: {cache.hits['nearby']} searches, {cache.hits['details']} place details")
     
     # Cost estimation (Google Maps pricing as of 2024)
     nearby_cost = nearby_search_calls * 0.032  # $0.032 per call
@@ -448,44 +658,25 @@ def main():
     print(f"   - Total estimated cost: ${total_cost:.2f}")
     print()
     
-    # Save results with timestamp
-    if unique_places:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f'jakarta_community_locations_{timestamp}.csv'
+    # Report saved results
+    if total_found:
+        print(f"💾 Results saved to: {output_file}")
+        print(f"📊 Dataset contains {total_found} community locations")
         
-        # Convert to DataFrame with exact column order matching existing dataset
-        columns = [
-            'place_id', 'name', 'category', 'sub_category', 'latitude', 'longitude',
-            'address', 'vicinity', 'rating', 'review_count', 'website', 'phone',
-            'price_level', 'types', 'is_operational', 'search_zone', 'search_keyword',
-            'is_open_now', 'timestamp', 'popularity_score', 'buffer_radius_m'
-        ]
+        # Show category breakdown
+        print()
+        print("📈 CATEGORY BREAKDOWN:")
+        for category, count in category_counts.most_common():
+            print(f"   - {category}: {count} locations")
         
-        df = pd.DataFrame.from_dict(unique_places, orient='index')
-        df = df.reindex(columns=columns)  # Ensure exact column order
-        
-        try:
-            df.to_csv(output_file, index=False)
-            print(f"💾 Results saved to: {output_file}")
-            print(f"📊 Dataset contains {len(df)} community locations")
-            
-            # Show category breakdown
-            print()
-            print("📈 CATEGORY BREAKDOWN:")
-            category_counts = df['category'].value_counts()
-            for category, count in category_counts.items():
-                print(f"   - {category}: {count} locations")
-            
-            print()
-            print("🎯 SUB-CATEGORY BREAKDOWN:")
-            sub_category_counts = df['sub_category'].value_counts()
-            for sub_category, count in sub_category_counts.items():
-                print(f"   - {sub_category}: {count} locations")
-                
-        except Exception as e:
-            logging.error(f"Error saving results: {e}")
-            return
+        print()
+        print("🎯 SUB-CATEGORY BREAKDOWN:")
+        for sub_category, count in sub_category_counts.most_common():
+            print(f"   - {sub_category}: {count} locations")
     else:
+        # Don't leave a header-only file behind
+        if not resume_file:
+            os.remove(output_file)
         print("⚠️  No new community places found to save.")
     
     print()
@@ -494,4 +685,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
\ No newline at end of file
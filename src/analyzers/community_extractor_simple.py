@@ -6,18 +6,37 @@ Only changes the search keywords to community-focused terms.
 """
 
 import os
+import re
+import sys
 import csv
 import time
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Tuple
-from collections import defaultdict
+from collections import Counter
+from pathlib import Path
 
 from dotenv import load_dotenv
 import googlemaps
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import (
+    ResponseCache, TokenBucket, build_requests_session, cancelling_executor, finalize_output,
+    load_saved_place_ids
+)
+
+# Faster JSON parsing of API responses when orjson is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,18 +46,38 @@ logging.basicConfig(
 # Load environment variables
 load_dotenv()
 
+# API requests in flight at once; the shared TokenBucket keeps the overall
+# request rate at the same budget as the old serial loop
+MAX_WORKERS = 10
+
+
+class GoogleMapsClient(googlemaps.Client):
+    """googlemaps.Client that parses response bodies with orjson when available.
+    
+    Status and error handling stay in googlemaps; only the body decoding of
+    each response is swapped out.
+    """
+    
+    def _get_body(self, response):
+        if orjson is not None:
+            content = response.content
+            response.json = lambda **kwargs: orjson.loads(content)
+        return super()._get_body(response)
+
 
 def load_search_zones(zones_file='search_zones.csv'):
     """Load search zones from CSV file - EXACT COPY from working script."""
-    zones = []
     try:
-        df = pd.read_csv(zones_file)
-        for _, row in df.iterrows():
-            zones.append({
-                'name': row['zone_name'],
-                'location': (float(row['latitude']), float(row['longitude'])),
-                'radius': int(row['radius'])
-            })
+        # A handful of small rows; no DataFrame needed
+        with open(zones_file, newline='', encoding='utf-8') as f:
+            zones = [
+                {
+                    'name': row['zone_name'],
+                    'location': (float(row['latitude']), float(row['longitude'])),
+                    'radius': int(row['radius'])
+                }
+                for row in csv.DictReader(f)
+            ]
         logging.info(f"Loaded {len(zones)} search zones")
         return zones
     except Exception as e:
@@ -89,15 +128,38 @@ def get_community_queries_dataframe():
     return pd.DataFrame(community_queries)
 
 
-def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10):
+def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10, limiter=None, cache=None):
     """Fetch places for a specific zone and keyword - EXACT COPY from working script."""
     places = []
     api_calls = 0
     max_pages = 3  # Limit to prevent excessive API usage
     
+    def add_search_info(results):
+        # Add zone information and capture types from search response
+        for place in results:
+            place['search_zone'] = zone['name']
+            place['search_keyword'] = keyword
+            # Capture types from the search response (this is the key fix)
+            place['search_types'] = place.get('types', [])
+        places.extend(results)
+    
+    cache_args = (zone['name'], zone['location'], zone['radius'], keyword)
+    cached_pages = cache.get('nearby', *cache_args) if cache is not None else None
+    if cached_pages is not None:
+        for results in cached_pages:
+            add_search_info(results)
+        return places, api_calls
+    
+    # Result pages of this search; only cached when every page was fetched
+    pages = []
+    complete = True
+    
     try:
         # Rate limiting
-        time.sleep(1.0 / rate_limit)
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.0 / rate_limit)
         
         # Initial search - SAME API CALL AS WORKING SCRIPT
         response = gmaps.places_nearby(
@@ -108,13 +170,8 @@ def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10):
         api_calls += 1
         
         if 'results' in response:
-            # Add zone information and capture types from search response
-            for place in response['results']:
-                place['search_zone'] = zone['name']
-                place['search_keyword'] = keyword
-                # Capture types from the search response (this is the key fix)
-                place['search_types'] = place.get('types', [])
-            places.extend(response['results'])
+            add_search_info(response['results'])
+            pages.append(response['results'])
         
         # Handle pagination - SAME AS WORKING SCRIPT
         page_count = 1
@@ -129,101 +186,132 @@ def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10):
                 page_count += 1
                 
                 if 'results' in response:
-                    for place in response['results']:
-                        place['search_zone'] = zone['name']
-                        place['search_keyword'] = keyword
-                        # Capture types from the search response (this is the key fix)
-                        place['search_types'] = place.get('types', [])
-                    places.extend(response['results'])
+                    add_search_info(response['results'])
+                    pages.append(response['results'])
                     
             except Exception as e:
                 logging.warning(f"Pagination error for '{keyword}' in {zone['name']}: {e}")
+                complete = False
                 break
     
     except Exception as e:
         logging.error(f"Error fetching places for '{keyword}' in {zone['name']}: {e}")
+        complete = False
+    
+    if cache is not None and complete:
+        cache.set('nearby', pages, *cache_args)
     
     return places, api_calls
 
 
-def get_place_details_enhanced(gmaps, place_id, rate_limit=10):
-    """Get detailed information for a place - EXACT COPY from working script."""
+def get_place_details_enhanced(gmaps, place_id, rate_limit=10, limiter=None, cache=None):
+    """Get the Place Details fields the Nearby Search response lacks (DETAILS_FIELDS).
+    
+    Returns None if the request fails; a place with none of the fields
+    gives an empty dict.
+    """
+    fields = list(DETAILS_FIELDS)
+    # The field list is part of the key, so changing it misses the cache
+    cache_args = (place_id, ','.join(sorted(fields)))
+    
+    if cache is not None:
+        cached = cache.get('details', *cache_args)
+        if cached is not None:
+            return cached
+    
     try:
-        time.sleep(1.0 / rate_limit)
-        
-        # Request specific fields - SAME AS WORKING SCRIPT
-        fields = [
-            'place_id', 'name', 'formatted_address', 'geometry',
-            'rating', 'user_ratings_total', 'website',
-            'opening_hours', 'formatted_phone_number', 'price_level',
-            'business_status', 'vicinity'
-        ]
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.0 / rate_limit)
         
         response = gmaps.place(
             place_id=place_id,
             fields=fields
         )
         
-        return response.get('result', {})
+        result = response.get('result', {})
+        if cache is not None:
+            cache.set('details', result, *cache_args)
+        return result
     
     except Exception as e:
         logging.warning(f"Error fetching details for place_id '{place_id}': {e}")
-        return {}
+        return None
+
+
+# Fields the Nearby Search results already carry; they are reused as-is
+# instead of being requested again from Place Details. opening_hours here
+# only has open_now, which is all the output uses
+SEARCH_RESULT_FIELDS = (
+    'place_id', 'name', 'geometry', 'vicinity', 'business_status',
+    'rating', 'user_ratings_total', 'price_level', 'opening_hours'
+)
+
+# Place Details fields the Nearby Search response lacks, only requested for
+# relevant places; the Contact ones are billed per SKU on top of Basic Data
+DETAILS_FIELDS = ('formatted_address', 'website', 'formatted_phone_number')
+
+# Output CSV columns, in the order process_place_for_output builds them
+OUTPUT_FIELDS = (
+    'place_id', 'name', 'category', 'sub_category', 'latitude', 'longitude',
+    'address', 'vicinity', 'rating', 'review_count', 'website', 'phone',
+    'price_level', 'types', 'is_operational', 'search_zone', 'search_keyword',
+    'is_open_now', 'timestamp', 'popularity_score', 'buffer_radius_m'
+)
+
+# Relevance filter vocabularies, compiled once at import
+IRRELEVANT_TYPES = frozenset([
+    'loading_dock',
+    'parking',
+    'gas_station',
+    'atm',
+    'bus_station',
+    'subway_station',
+    'train_station',
+    'airport',
+    'lodging',
+    'storage',
+    'warehouse',
+    'construction',
+    'industrial',
+    'utility',
+    'government',
+    'embassy',
+    'cemetery',
+    'funeral_home',
+    'place_of_worship'
+])
+
+# Matched anywhere in the lowercased name, like the old substring checks
+IRRELEVANT_NAME_RE = re.compile('|'.join(map(re.escape, [
+    'loading dock',
+    'parking lot',
+    'parking area',
+    'gas station',
+    'petrol station',
+    'atm',
+    'bank atm',
+    'construction site',
+    'warehouse',
+    'storage facility'
+])))
 
 
 def is_relevant_business(name, business_types):
     """Filter out irrelevant businesses - EXACT COPY from working script."""
-    name_lower = name.lower()
-    types_lower = [t.lower() for t in business_types] if business_types else []
-    
-    # Irrelevant business types to filter out
-    irrelevant_types = [
-        'loading_dock',
-        'parking',
-        'gas_station',
-        'atm',
-        'bus_station',
-        'subway_station',
-        'train_station',
-        'airport',
-        'lodging',
-        'storage',
-        'warehouse',
-        'construction',
-        'industrial',
-        'utility',
-        'government',
-        'embassy',
-        'cemetery',
-        'funeral_home',
-        'place_of_worship'
-    ]
-    
-    # Irrelevant name patterns
-    irrelevant_name_patterns = [
-        'loading dock',
-        'parking lot',
-        'parking area',
-        'gas station',
-        'petrol station',
-        'atm',
-        'bank atm',
-        'construction site',
-        'warehouse',
-        'storage facility'
-    ]
-    
     # Check if any irrelevant types match
-    for irrelevant_type in irrelevant_types:
-        if irrelevant_type in types_lower:
-            return False
+    if business_types and not IRRELEVANT_TYPES.isdisjoint(t.lower() for t in business_types):
+        return False
     
     # Check if any irrelevant name patterns match
-    for pattern in irrelevant_name_patterns:
-        if pattern in name_lower:
-            return False
-    
-    return True
+    return IRRELEVANT_NAME_RE.search(name.lower()) is None
+
+
+@lru_cache(maxsize=None)
+def _join_types(types):
+    """Comma-join a types tuple; places with the same types share one string."""
+    return ', '.join(types)
 
 
 def classify_business(name, business_types, category, sub_category):
@@ -235,26 +323,37 @@ def classify_business(name, business_types, category, sub_category):
     return sub_category
 
 
-def calculate_popularity_score(rating, review_count):
-    """Calculate popularity score."""
-    if not rating or not review_count:
-        return 0.0
-    
-    try:
-        rating = float(rating)
-        review_count = int(review_count)
-        
-        # Simple popularity formula: normalize rating (0-1) * log-scaled review count
-        normalized_rating = (rating - 1) / 4  # Convert 1-5 scale to 0-1
-        log_reviews = min(1.0, review_count / 1000)  # Cap at 1000 reviews = 1.0
-        
-        return round(normalized_rating * log_reviews, 2)
-    except:
-        return 0.0
+def add_popularity_scores(df):
+    """Fill df['popularity_score'] from rating and review_count in one vectorized pass.
+    
+    Normalized rating (1-5 scale to 0-1) times review count capped at 1000
+    reviews = 1.0; places without a rating or reviews score 0.0.
+    """
+    rating = pd.to_numeric(df['rating'], errors='coerce')
+    reviews = pd.to_numeric(df['review_count'], errors='coerce').fillna(0)
+    
+    score = (rating - 1) / 4 * (reviews / 1000).clip(upper=1)
+    has_inputs = rating.fillna(0).ne(0) & reviews.ne(0)
+    score = score.where(has_inputs, 0.0).fillna(0.0).astype('float64')
+    
+    # Series.round() rounds score * 100, and the float error of that product
+    # can move a value lying just off a half onto it (or across it), so a few
+    # scores would differ by 0.01 from round() in the per-row formula. Only
+    # those near-half values are rounded again with round()
+    rounded = score.round(2)
+    scaled = score * 100
+    near_half = (scaled - np.floor(scaled) - 0.5).abs() < 1e-6
+    rounded[near_half] = [round(value, 2) for value in score[near_half]]
+    df['popularity_score'] = rounded
+    return df
 
 
-def process_place_for_output(place_details, category, sub_category, search_info, search_types=None):
-    """Process place details - EXACT COPY from working script with popularity score added."""
+def process_place_for_output(place_details, category, sub_category, search_info, search_types=None, run_timestamp=None):
+    """Process place details - EXACT COPY from working script (popularity score added later).
+    
+    run_timestamp is the ISO timestamp shared by every row of one run; the
+    current time is used when it is not given.
+    """
     name = place_details.get('name', '')
     
     # Use search_types from the initial search response, fallback to details if needed
@@ -276,10 +375,8 @@ def process_place_for_output(place_details, category, sub_category, search_info,
     if price_level:
         price_level = '$' * price_level  # Convert to $, $$, $$$, $$$$
     
-    # Calculate popularity score
     rating = place_details.get('rating', '')
     review_count = place_details.get('user_ratings_total', 0)
-    popularity_score = calculate_popularity_score(rating, review_count)
     
     return {
         'place_id': place_details.get('place_id', ''),
@@ -295,30 +392,40 @@ def process_place_for_output(place_details, category, sub_category, search_info,
         'website': place_details.get('website', ''),
         'phone': place_details.get('formatted_phone_number', ''),
         'price_level': price_level,
-        'types': ', '.join(business_types),
+        'types': _join_types(tuple(business_types)),
         'is_operational': is_operational,
         'search_zone': search_info['zone'],
         'search_keyword': search_info['keyword'],
         'is_open_now': place_details.get('opening_hours', {}).get('open_now', ''),
-        'timestamp': datetime.now().isoformat(),
-        'popularity_score': popularity_score,
+        'timestamp': run_timestamp or datetime.now().isoformat(),
+        'popularity_score': '',  # Filled for all rows at once by add_popularity_scores
         'buffer_radius_m': ''
     }
 
 
-def main():
-    """Main execution function - EXACT STRUCTURE as working script."""
+def main(resume_file=None, use_cache=True):
+    """Main execution function - EXACT STRUCTURE as working script.
+    
+    Pass the output file of an interrupted run as `resume_file` to add to it;
+    places already saved there are not looked up again. With use_cache=False
+    every request goes to the API and nothing is cached.
+    """
     print("🏘️  Simple Community Extractor (Based on Working Pet Market Script)")
     print("=" * 70)
     
+    # Every row of this run is stamped with its start time
+    run_started = datetime.now()
+    run_timestamp = run_started.isoformat()
+    
     # Load configuration - SAME AS WORKING SCRIPT
     api_key = os.getenv('GOOGLE_MAPS_API_KEY')
     if not api_key or api_key == 'YOUR_API_KEY_HERE':
         print("❌ Error: Please set your Google Maps API key in .env file")
         return
     
-    # Initialize Google Maps client - SAME AS WORKING SCRIPT
-    gmaps = googlemaps.Client(key=api_key)
+    # Initialize Google Maps client; every request of the run shares one
+    # pooled keep-alive session
+    gmaps = GoogleMapsClient(key=api_key, requests_session=build_requests_session(MAX_WORKERS))
     
     # Load search zones and queries - SAME STRUCTURE AS WORKING SCRIPT
     zones = load_search_zones()
@@ -333,89 +440,146 @@ def main():
     print(f"💡 Total searches: {len(zones) * len(queries_df)}")
     print()
     
-    # Master dictionary to store unique places - SAME AS WORKING SCRIPT
-    unique_places = {}
+    # Rows are streamed to the output file as they are produced, so a failed
+    # run keeps every place fetched so far
+    if resume_file:
+        output_file = resume_file
+        saved_ids = load_saved_place_ids(output_file)
+        print(f"♻️  Resuming {output_file}: {len(saved_ids)} places already saved")
+        print()
+    else:
+        output_file = f'jakarta_community_simple_{run_started.strftime("%Y%m%d_%H%M%S")}.csv'
+        saved_ids = set()
+    
+    # Line buffered: every finished row reaches the file immediately
+    output = open(output_file, 'a' if resume_file else 'w', buffering=1, newline='', encoding='utf-8')
+    writer = csv.DictWriter(output, fieldnames=OUTPUT_FIELDS)
+    if not resume_file:
+        writer.writeheader()
+    places_written = 0
     
     # Statistics - SAME AS WORKING SCRIPT
-    stats = defaultdict(int)
+    stats = Counter()
     api_calls = 0
     
-    # Process each zone - EXACT SAME LOOP STRUCTURE AS WORKING SCRIPT
-    for zone in zones:
-        print(f"\n🗺️  Processing zone: {zone['name']}")
-        print(f"   Location: {zone['location']}")
-        print(f"   Radius: {zone['radius']}m")
-        
-        # Process each query in this zone
-        zone_progress = tqdm(queries_df.iterrows(), 
-                           total=len(queries_df),
-                           desc=f"  {zone['name']}")
+    # Same average budget as the old per-call sleep of 1.0 / rate_limit seconds
+    limiter = TokenBucket(rate=10)
+    cache = ResponseCache() if use_cache else None
+    
+    # (keyword, category, sub_category) tuples, unpacked directly in the loops below
+    queries = list(queries_df[['keyword', 'category', 'sub_category']].itertuples(index=False, name=None))
+    
+    # Pass 1 output: the first sighting of each place_id, in the order places
+    # were first seen
+    search_results = {}
+    # Places never looked up: filtered out, or saved by the run being resumed
+    skip_ids = set(saved_ids)
+    
+    with output, cancelling_executor(MAX_WORKERS) as executor:
+        # Every zone-query search is submitted up front so they run
+        # concurrently; results are still handled below in zone and query order
+        zone_futures = [
+            [
+                executor.submit(
+                    fetch_places_for_zone_and_keyword,
+                    gmaps, keyword, zone, rate_limit=10, limiter=limiter, cache=cache
+                )
+                for keyword, _, _ in queries
+            ]
+            for zone in zones
+        ]
         
-        for _, query in zone_progress:
-            keyword = query['keyword']
-            category = query['category']
-            sub_category = query['sub_category']
+        # Process each zone - EXACT SAME LOOP STRUCTURE AS WORKING SCRIPT
+        for zone, futures in zip(zones, zone_futures):
+            print(f"\n🗺️  Processing zone: {zone['name']}")
+            print(f"   Location: {zone['location']}")
+            print(f"   Radius: {zone['radius']}m")
             
-            # Update progress bar
-            zone_progress.set_postfix({'keyword': keyword[:20]})
+            # Process each query in this zone
+            zone_progress = tqdm(zip(queries, futures),
+                               total=len(queries_df),
+                               desc=f"  {zone['name']}")
             
-            # Fetch places - SAME FUNCTION CALL AS WORKING SCRIPT
-            places, calls = fetch_places_for_zone_and_keyword(
-                gmaps, keyword, zone, rate_limit=10
-            )
-            api_calls += calls
-            stats[f'searches_{category}'] += 1
-            
-            # Process each place - SAME LOOP AS WORKING SCRIPT
-            for place in places:
-                place_id = place.get('place_id')
+            for (keyword, category, sub_category), future in zone_progress:
+                # Update progress bar
+                zone_progress.set_postfix({'keyword': keyword[:20]})
                 
-                if place_id and place_id not in unique_places:
-                    # Get the types from the search response
-                    search_types = place.get('search_types', [])
-                    
-                    # Get detailed information - SAME API CALL AS WORKING SCRIPT
-                    details = get_place_details_enhanced(gmaps, place_id)
-                    api_calls += 1
+                places, calls = future.result()
+                api_calls += calls
+                
+                # Pass 1: record where each place was first found, with the
+                # types from the search response. The search response already
+                # has the name and types, so irrelevant places are dropped here
+                # without paying for a details call
+                for place in places:
+                    place_id = place.get('place_id')
                     
-                    if details:
-                        # Check if this is a relevant business using search types
-                        name = details.get('name', '')
-                        
-                        if is_relevant_business(name, search_types):
-                            # Process and store, passing the search types
-                            place_info = process_place_for_output(
-                                details, category, sub_category,
-                                {'zone': zone['name'], 'keyword': keyword},
-                                search_types
-                            )
-                            unique_places[place_id] = place_info
-                            stats[f'found_{category}'] += 1
-                            stats[f'found_{sub_category}'] += 1
-                        else:
+                    if place_id and place_id not in search_results and place_id not in skip_ids:
+                        if not is_relevant_business(place.get('name', ''), place.get('search_types', [])):
+                            skip_ids.add(place_id)
                             stats['filtered_irrelevant'] += 1
+                            continue
+                        
+                        search_results[place_id] = {
+                            'search_fields': {
+                                field: place[field] for field in SEARCH_RESULT_FIELDS if field in place
+                            },
+                            'search_types': place.get('search_types', []),
+                            'zone': zone['name'],
+                            'keyword': keyword,
+                            'category': category,
+                            'sub_category': sub_category
+                        }
+        
+        # Pass 2: one details lookup per unique place, run on the pool and
+        # handled in first-seen order so the output matches the serial run
+        print(f"\n📋 Relevant unique places found by search: {len(search_results)}")
+        detail_futures = [
+            executor.submit(get_place_details_enhanced, gmaps, place_id, limiter=limiter, cache=cache)
+            for place_id in search_results
+        ]
+        
+        for (place_id, result), future in tqdm(zip(search_results.items(), detail_futures),
+                                               total=len(detail_futures),
+                                               desc="  Place details"):
+            category = result['category']
+            sub_category = result['sub_category']
+            search_types = result['search_types']
+            details = future.result()
+            api_calls += 1
+            
+            if details is not None:
+                # Complete the details with the fields from the search response
+                details = {**result['search_fields'], **details}
+                
+                # Process and store, passing the search types
+                place_info = process_place_for_output(
+                    details, category, sub_category,
+                    {'zone': result['zone'], 'keyword': result['keyword']},
+                    search_types, run_timestamp
+                )
+                writer.writerow(place_info)
+                places_written += 1
     
-    # Convert to DataFrame - SAME AS WORKING SCRIPT
-    df = pd.DataFrame.from_dict(unique_places, orient='index')
-    
-    # Sort by category and sub_category - SAME AS WORKING SCRIPT
-    if not df.empty:
-        df = df.sort_values(['category', 'sub_category', 'rating'], 
-                          ascending=[True, True, False])
+    # Cached details cost nothing; cached searches never counted a call
+    if cache is not None:
+        api_calls -= cache.hits['details']
+        cache.close()
     
-    # Save results - SAME AS WORKING SCRIPT
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_file = f'jakarta_community_simple_{timestamp}.csv'
-    df.to_csv(output_file, index=False, encoding='utf-8')
+    # Popularity scores and the final sort need every row, so they are
+    # applied once the run is complete
+    df = finalize_output(output_file, OUTPUT_FIELDS, score=add_popularity_scores)
     
     # Print summary - SAME AS WORKING SCRIPT
     print("\n" + "=" * 60)
     print("📊 COMMUNITY EXTRACTION SUMMARY")
     print("=" * 60)
     
-    print(f"\n🎯 Total unique places found: {len(unique_places)}")
+    print(f"\n🎯 Total unique places found: {places_written}")
     print(f"📞 Total API calls made: {api_calls}")
-    print(f"🚫 Irrelevant results filtered: {stats.get('filtered_irrelevant', 0)}")
+    print(f"🚫 Irrelevant results filtered: {stats['filtered_irrelevant']}")
+    if cache is not None:
+        print(f"💾 Cache hits: {cache.hits['nearby']} searches, {cache.hits['details']} place details")
     
     # Category breakdown
     if not df.empty:
@@ -442,4 +606,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Usage: community_extractor_simple.py [--no-cache] [output_file_to_resume]
+    args = [arg for arg in sys.argv[1:] if arg != '--no-cache']
+    main(args[0] if args else None, use_cache='--no-cache' not in sys.argv[1:])
\ No newline at end of file
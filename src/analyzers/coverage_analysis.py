@@ -3,8 +3,16 @@
 Analyze coverage and cost for comprehensive Jakarta search
 """
 
+import sys
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-import math
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import zone_centers_m, zone_containment
 
 # Load search zones
 zones_10 = pd.read_csv('search_zones_original.csv')
@@ -18,14 +26,30 @@ queries = pd.DataFrame({
 print("🗺️  Jakarta Pet Wellness Market Analysis - Coverage Comparison")
 print("=" * 70)
 
+# Zone areas in km² (π * r², radius converted from meters)
+def zone_areas_km2(zones_df):
+    return np.pi * (zones_df['radius'].to_numpy(dtype=np.float64) / 1000) ** 2
+
 # Calculate coverage area
 def calculate_coverage_area(zones_df):
-    total_area = 0
-    for _, zone in zones_df.iterrows():
-        # Area = π * r²
-        area = math.pi * (zone['radius'] / 1000) ** 2  # Convert to km²
-        total_area += area
-    return total_area
+    return float(zone_areas_km2(zones_df).sum())
+
+# Area covered by at least one zone (km²), counted on a grid of cell_m cells
+def calculate_union_area(zones_df, cell_m=250):
+    x, y = zone_centers_m(zones_df['latitude'], zones_df['longitude'])
+    r = zones_df['radius'].to_numpy(dtype=np.float64)
+    gx = np.arange((x - r).min(), (x + r).max() + cell_m, cell_m)
+    gy = np.arange((y - r).min(), (y + r).max() + cell_m, cell_m)
+    covered = np.zeros((len(gy), len(gx)), dtype=bool)
+    for zx, zy, zr in zip(x, y, r):
+        covered |= ((gx - zx) ** 2)[np.newaxis, :] + ((gy - zy) ** 2)[:, np.newaxis] <= zr ** 2
+    return covered.sum() * (cell_m / 1000) ** 2
+
+# Zones whose whole circle lies inside another (larger or equal) zone
+def find_contained_zones(zones_df):
+    inside = zone_containment(zones_df['latitude'], zones_df['longitude'], zones_df['radius'])
+    names = zones_df['zone_name'].to_numpy()
+    return [(names[i], names[inside[i]].tolist()) for i in np.flatnonzero(inside.any(axis=1))]
 
 # Jakarta metropolitan area is approximately 662 km²
 jakarta_area = 662
@@ -81,6 +105,18 @@ area_counts = zones_28['zone_name'].str.split('_').str[0].value_counts()
 for area, count in area_counts.items():
     print(f"   {area}: {count} zones")
 
+# Overlap between zones: every (zone, keyword) search pays for its whole
+# circle, so area covered more than once is paid for more than once
+union_28 = calculate_union_area(zones_28)
+print(f"\n🔁 Zone Overlap (Comprehensive Plan):")
+print(f"   - Area covered at least once: {union_28:.0f} km²")
+print(f"   - Search area per keyword: {area_28:.0f} km² ({area_28/union_28:.1f}x the covered area)")
+contained_28 = find_contained_zones(zones_28)
+if contained_28:
+    print(f"   - Zones lying entirely inside another zone:")
+    for zone_name, containers in contained_28:
+        print(f"     {zone_name} (inside {', '.join(containers)})")
+
 # Calculate expected results
 print(f"\n🎯 Expected Results:")
 print(f"   Original Plan:")
@@ -102,7 +138,7 @@ visualization_data = pd.DataFrame({
     'latitude': zones_28['latitude'],
     'longitude': zones_28['longitude'],
     'radius_m': zones_28['radius'],
-    'area_km2': zones_28['radius'].apply(lambda r: math.pi * (r/1000)**2).round(1)
+    'area_km2': zone_areas_km2(zones_28).round(1)
 })
 visualization_data.to_csv('zones_visualization.csv', index=False)
 print(f"\n📊 Zone visualization data saved to: zones_visualization.csv")
\ No newline at end of file
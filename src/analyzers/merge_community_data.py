@@ -5,11 +5,19 @@ Safely merges community locations data with existing pet market dataset
 while preserving all existing competitor data and maintaining data integrity.
 """
 
+import argparse
 import pandas as pd
 import logging
+import sys
 from datetime import datetime
 from pathlib import Path
-import sys
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import (
+    CSV_DTYPES, align_categories, drop_unused_categories, find_latest_file, pa, write_market_data
+)
 
 # Configure logging
 logging.basicConfig(
@@ -25,7 +33,7 @@ def load_and_validate_dataset(file_path, dataset_name):
         return None
     
     try:
-        df = pd.read_csv(file_path)
+        df = pd.read_csv(file_path, dtype=CSV_DTYPES)
         logging.info(f"Loaded {dataset_name}: {len(df)} records")
         
         # Validate required columns
@@ -42,12 +50,14 @@ def load_and_validate_dataset(file_path, dataset_name):
             return None
         
         # Validate place_id uniqueness
-        duplicate_ids = df[df['place_id'].duplicated()]['place_id'].tolist()
-        if duplicate_ids:
-            logging.warning(f"{dataset_name} has duplicate place_ids: {len(duplicate_ids)} duplicates")
-            # Remove duplicates, keeping first occurrence
-            df = df.drop_duplicates(subset=['place_id'], keep='first')
+        # Remove duplicates, keeping first occurrence (one hash pass)
+        n_before = len(df)
+        df = df.drop_duplicates(subset=['place_id'], keep='first')
+        n_dupes = n_before - len(df)
+        if n_dupes:
+            logging.warning(f"{dataset_name} has duplicate place_ids: {n_dupes} duplicates")
             logging.info(f"After deduplication: {len(df)} records")
+            df = drop_unused_categories(df)
         
         return df
         
@@ -71,8 +81,8 @@ def analyze_datasets(existing_df, community_df):
     print(f"   - Categories: {community_df['category'].value_counts().to_dict()}")
     
     # Check for any overlapping place_ids (should be none due to deduplication)
-    existing_ids = set(existing_df['place_id'])
-    community_ids = set(community_df['place_id'])
+    existing_ids = pd.Index(existing_df['place_id']).unique()
+    community_ids = pd.Index(community_df['place_id']).unique()
     overlapping_ids = existing_ids.intersection(community_ids)
     
     print(f"\n🔍 OVERLAP ANALYSIS:")
@@ -80,7 +90,7 @@ def analyze_datasets(existing_df, community_df):
     print(f"   - Community place_ids: {len(community_ids)}")
     print(f"   - Overlapping place_ids: {len(overlapping_ids)}")
     
-    if overlapping_ids:
+    if len(overlapping_ids):
         print(f"   - ⚠️  WARNING: Found {len(overlapping_ids)} overlapping place_ids")
         print(f"   - These will be removed from community data to avoid duplicates")
     else:
@@ -93,18 +103,26 @@ def merge_datasets(existing_df, community_df, overlapping_ids):
     """Merge datasets while handling any overlaps."""
     
     # Remove any overlapping place_ids from community data
-    if overlapping_ids:
+    if len(overlapping_ids):
         logging.warning(f"Removing {len(overlapping_ids)} overlapping records from community data")
-        community_df = community_df[~community_df['place_id'].isin(overlapping_ids)]
+        community_df = drop_unused_categories(community_df[~community_df['place_id'].isin(overlapping_ids)])
         logging.info(f"Community data after overlap removal: {len(community_df)} records")
     
-    # Combine datasets
-    merged_df = pd.concat([existing_df, community_df], ignore_index=True)
+    # Combine datasets; an empty side needs no concat (and no block copy)
+    if len(community_df) == 0:
+        merged_df = existing_df.reset_index(drop=True)
+    elif len(existing_df) == 0:
+        merged_df = community_df.reset_index(drop=True)
+    else:
+        existing_df, community_df = align_categories(existing_df, community_df)
+        merged_df = pd.concat([existing_df, community_df], ignore_index=True, sort=False)
     
-    # Final validation
-    duplicate_check = merged_df[merged_df['place_id'].duplicated()]
-    if len(duplicate_check) > 0:
-        logging.error(f"ERROR: Merged dataset still has {len(duplicate_check)} duplicates!")
+    # Final validation. Overlaps were removed above, so this only guards the
+    # invariant: is_unique avoids building a mask and a filtered copy, and
+    # the duplicates are only counted when there are some
+    if not merged_df['place_id'].is_unique:
+        n_dupes = int(merged_df['place_id'].duplicated().sum())
+        logging.error(f"ERROR: Merged dataset still has {n_dupes} duplicates!")
         return None
     
     logging.info(f"Successfully merged datasets: {len(merged_df)} total records")
@@ -119,19 +137,21 @@ def validate_merged_dataset(merged_df, original_existing_count, original_communi
     print(f"   - Original community records: {original_community_count}")
     print(f"   - Merged dataset records: {len(merged_df)}")
     
+    # One pass over the category column serves every check below
+    category_counts = merged_df['category'].value_counts()
+    
     # Check that we didn't lose any existing data
-    competitor_records = len(merged_df[merged_df['category'] == 'Competitor'])
+    competitor_records = int(category_counts.get('Competitor', 0))
     print(f"   - Competitor records preserved: {competitor_records}")
     
     # Check community categories
     community_categories = ['Community_Infrastructure', 'Middle_Class_Accessibility', 
                           'Family_Services', 'Value_Conscious_Retail']
-    community_records = len(merged_df[merged_df['category'].isin(community_categories)])
+    community_records = int(category_counts.reindex(community_categories, fill_value=0).sum())
     print(f"   - Community records added: {community_records}")
     
     # Category breakdown
     print(f"\n📈 FINAL CATEGORY BREAKDOWN:")
-    category_counts = merged_df['category'].value_counts()
     for category, count in category_counts.items():
         print(f"   - {category}: {count} records")
     
@@ -145,21 +165,30 @@ def main():
     print("Safely merging community locations with existing pet market dataset")
     print("="*60)
     
+    parser = argparse.ArgumentParser(
+        description="Merge community locations into the pet market dataset",
+        usage="%(prog)s [--output-format {csv,parquet}] [existing_file] [community_file]"
+    )
+    parser.add_argument('files', nargs='*', help=argparse.SUPPRESS)
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], default='csv',
+                        help="format of the merged dataset (parquet requires pyarrow)")
+    args = parser.parse_args()
+    if args.output_format == 'parquet' and pa is None:
+        parser.error("--output-format parquet requires pyarrow")
+    
     # Default file paths - can be overridden via command line
     existing_file = 'jakarta_pet_market_CLEAN_20250805_102308.csv'
     community_file = None
     
     # Check for command line arguments
-    if len(sys.argv) == 3:
-        existing_file = sys.argv[1]
-        community_file = sys.argv[2]
-    elif len(sys.argv) == 2:
-        community_file = sys.argv[1]
+    if len(args.files) == 2:
+        existing_file, community_file = args.files
+    elif len(args.files) == 1:
+        community_file = args.files[0]
     else:
         # Find the most recent community file
-        community_files = list(Path('.').glob('jakarta_community_locations_*.csv'))
-        if community_files:
-            community_file = str(max(community_files, key=lambda x: x.stat().st_mtime))
+        community_file = find_latest_file('jakarta_community_locations_')
+        if community_file is not None:
             print(f"📁 Auto-detected community file: {community_file}")
         else:
             print("❌ No community locations file found!")
@@ -199,27 +228,32 @@ def main():
     
     # Save merged dataset
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f'jakarta_complete_with_community_{timestamp}.csv'
+    output_file = f'jakarta_complete_with_community_{timestamp}.{args.output_format}'
     
     try:
-        merged_df.to_csv(output_file, index=False)
+        write_market_data(merged_df, output_file, args.output_format)
         print(f"\n💾 Merged dataset saved to: {output_file}")
         print(f"📊 Total records: {len(merged_df)}")
         
         # Create a summary report
         summary_file = f'merge_summary_{timestamp}.txt'
-        with open(summary_file, 'w') as f:
-            f.write("COMMUNITY DATA MERGE SUMMARY\n")
-            f.write("="*40 + "\n\n")
-            f.write(f"Merge timestamp: {datetime.now().isoformat()}\n")
-            f.write(f"Existing dataset: {existing_file} ({original_existing_count} records)\n")
-            f.write(f"Community dataset: {community_file} ({original_community_count} records)\n")
-            f.write(f"Merged dataset: {output_file} ({len(merged_df)} records)\n\n")
-            f.write("Category breakdown:\n")
-            for category, count in merged_df['category'].value_counts().items():
-                f.write(f"  - {category}: {count} records\n")
-            f.write(f"\nOverlapping place_ids removed: {len(overlapping_ids)}\n")
-            f.write(f"Merge completed successfully: {len(merged_df) == (original_existing_count + original_community_count - len(overlapping_ids))}\n")
+        lines = [
+            "COMMUNITY DATA MERGE SUMMARY",
+            "=" * 40,
+            "",
+            f"Merge timestamp: {datetime.now().isoformat()}",
+            f"Existing dataset: {existing_file} ({original_existing_count} records)",
+            f"Community dataset: {community_file} ({original_community_count} records)",
+            f"Merged dataset: {output_file} ({len(merged_df)} records)",
+            "",
+            "Category breakdown:",
+            *(f"  - {category}: {count} records"
+              for category, count in merged_df['category'].value_counts().items()),
+            "",
+            f"Overlapping place_ids removed: {len(overlapping_ids)}",
+            f"Merge completed successfully: {len(merged_df) == (original_existing_count + original_community_count - len(overlapping_ids))}",
+        ]
+        Path(summary_file).write_text('\n'.join(lines) + '\n', encoding='utf-8')
         
         print(f"📋 Summary report saved to: {summary_file}")
         
@@ -4,17 +4,25 @@ Merge the main comprehensive dataset with supplementary search results
 """
 import pandas as pd
 from datetime import datetime
+import argparse
 import logging
 import os
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import CSV_DTYPES, align_categories, drop_unused_categories, pa, write_market_data
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
-def merge_datasets():
+def merge_datasets(output_format='csv', sort=False):
     """Merge main and supplementary datasets"""
     
     # Load main dataset
     logging.info("Loading main comprehensive dataset...")
-    main_df = pd.read_csv('jakarta_pet_market_analysis_20250805_095802.csv')
+    main_df = pd.read_csv('jakarta_pet_market_analysis_20250805_095802.csv', dtype=CSV_DTYPES)
     logging.info(f"Main dataset: {len(main_df)} locations")
     
     # Load supplementary dataset
@@ -23,7 +31,7 @@ def merge_datasets():
         # Load the final supplementary file
         supp_file = 'jakarta_supplementary_analysis_20250805_103712.csv'
         if os.path.exists(supp_file):
-            supp_df = pd.read_csv(supp_file)
+            supp_df = pd.read_csv(supp_file, dtype=CSV_DTYPES)
             logging.info(f"Supplementary dataset (final): {len(supp_df)} locations")
         else:
             logging.error("No supplementary files found")
@@ -34,22 +42,33 @@ def merge_datasets():
     
     # Combine datasets
     logging.info("Merging datasets...")
-    combined_df = pd.concat([main_df, supp_df], ignore_index=True)
+    if len(supp_df) == 0:
+        combined_df = main_df.reset_index(drop=True)
+    elif len(main_df) == 0:
+        combined_df = supp_df.reset_index(drop=True)
+    else:
+        main_df, supp_df = align_categories(main_df, supp_df)
+        combined_df = pd.concat([main_df, supp_df], ignore_index=True, sort=False)
     
     # Remove duplicates based on place_id
     before_dedup = len(combined_df)
     combined_df = combined_df.drop_duplicates(subset='place_id', keep='first')
     after_dedup = len(combined_df)
+    if after_dedup < before_dedup:
+        combined_df = drop_unused_categories(combined_df)
     logging.info(f"Combined dataset: {before_dedup} → {after_dedup} locations ({before_dedup - after_dedup} duplicates removed)")
     
-    # Sort by category and sub_category
-    combined_df = combined_df.sort_values(['category', 'sub_category', 'rating'], 
-                                        ascending=[True, True, False])
+    # Sort by category and sub_category only on request; rows otherwise keep
+    # their load order. Both are categoricals with sorted categories, so
+    # this sorts on their integer codes
+    if sort:
+        combined_df = combined_df.sort_values(['category', 'sub_category', 'rating'], 
+                                            ascending=[True, True, False], ignore_index=True)
     
     # Save merged dataset
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_file = f'jakarta_pet_market_COMPLETE_{timestamp}.csv'
-    combined_df.to_csv(output_file, index=False, encoding='utf-8')
+    output_file = f'jakarta_pet_market_COMPLETE_{timestamp}.{output_format}'
+    write_market_data(combined_df, output_file, output_format)
     
     # Print summary
     logging.info("\n" + "="*60)
@@ -74,4 +93,12 @@ def merge_datasets():
     return output_file
 
 if __name__ == "__main__":
-    merge_datasets()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], default='csv',
+                        help="format of the merged dataset (parquet requires pyarrow)")
+    parser.add_argument('--sort', action='store_true',
+                        help="sort the output by category, sub_category and rating")
+    args = parser.parse_args()
+    if args.output_format == 'parquet' and pa is None:
+        parser.error("--output-format parquet requires pyarrow")
+    merge_datasets(args.output_format, args.sort)
\ No newline at end of file
@@ -17,6 +17,17 @@ import pandas as pd
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import TokenBucket, build_requests_session, cancelling_executor, write_market_csv
+
+# Characters stripped from user-supplied strings, as a str.translate table
+_SANITIZE_TABLE = str.maketrans('', '', '<>"\';\\')
+
+# Concurrent API requests; the shared rate limiter still caps requests/second
+MAX_WORKERS = 10
+
 
 def setup_logging():
     """Configure logging for the application."""
@@ -52,15 +63,27 @@ def sanitize_input(input_str: str, max_length: int = 100) -> str:
         raise ValueError("Input must be a string")
     
     # Remove potentially dangerous characters
-    sanitized = re.sub(r'[<>"\';\\]', '', input_str.strip())
+    sanitized = input_str.strip().translate(_SANITIZE_TABLE)
     
     # Limit length
     if len(sanitized) > max_length:
         sanitized = sanitized[:max_length]
-        logging.warning(f"Input truncated to {max_length} characters")
+        logging.warning("Input truncated to %d characters", max_length)
     
     return sanitized
 
+def sanitize_column(values: pd.Series, max_length: int = 100) -> pd.Series:
+    """Sanitize a whole column with the same rules as sanitize_input."""
+    # str() every cell like sanitize_input(str(x)) would, so None -> 'None'
+    as_text = pd.Series(values.to_numpy(dtype=object).astype(str), index=values.index)
+    sanitized = as_text.str.strip().str.translate(_SANITIZE_TABLE)
+    
+    truncated = int((sanitized.str.len() > max_length).sum())
+    if truncated:
+        logging.warning("%d input(s) truncated to %d characters", truncated, max_length)
+    
+    return sanitized.str.slice(0, max_length)
+
 def validate_coordinates(lat: float, lng: float) -> bool:
     """Validate latitude and longitude values."""
     return -90 <= lat <= 90 and -180 <= lng <= 180
@@ -118,10 +141,14 @@ def load_config() -> Dict:
     return config
 
 
-def initialize_maps_client(api_key: str) -> googlemaps.Client:
-    """Initialize the Google Maps client with the provided API key."""
+def initialize_maps_client(api_key: str, pool_size: int = MAX_WORKERS) -> googlemaps.Client:
+    """Initialize the Google Maps client with the provided API key.
+    
+    The client's requests session keeps up to pool_size keep-alive
+    connections, one per worker thread sharing it.
+    """
     try:
-        client = googlemaps.Client(key=api_key)
+        client = googlemaps.Client(key=api_key, requests_session=build_requests_session(pool_size))
         # Test the API key with a simple request
         # client.geocode("test", language="en")  # Commented out - not needed for places_nearby
         return client
@@ -155,8 +182,8 @@ def read_queries(queries_path: str = 'queries.csv') -> pd.DataFrame:
             queries_df = queries_df.head(max_queries)
         
         # Sanitize inputs
-        queries_df['keyword'] = queries_df['keyword'].apply(lambda x: sanitize_input(str(x), 100))
-        queries_df['category'] = queries_df['category'].apply(lambda x: sanitize_input(str(x), 50))
+        queries_df['keyword'] = sanitize_column(queries_df['keyword'], 100)
+        queries_df['category'] = sanitize_column(queries_df['category'], 50)
         
         # Remove empty queries
         queries_df = queries_df[queries_df['keyword'].str.strip() != '']
@@ -172,15 +199,22 @@ def read_queries(queries_path: str = 'queries.csv') -> pd.DataFrame:
         sys.exit(1)
 
 
-def fetch_places_for_keyword(gmaps: googlemaps.Client, keyword: str, location: Tuple[float, float], radius: int, rate_limit: int = 10) -> Tuple[List[Dict], int]:
-    """Fetch all places for a given keyword, handling pagination with rate limiting."""
+def fetch_places_for_keyword(gmaps: googlemaps.Client, keyword: str, location: Tuple[float, float], radius: int, rate_limit: int = 10, limiter: Optional[TokenBucket] = None) -> Tuple[List[Dict], int]:
+    """Fetch all places for a given keyword, handling pagination with rate limiting.
+    
+    Pass a shared limiter when calling from several threads; without one each
+    call sleeps 1/rate_limit seconds.
+    """
     places = []
     api_calls = 0
     max_pages = 3  # Limit pagination to prevent excessive API usage
     
     try:
         # Rate limiting
-        time.sleep(1.0 / rate_limit)
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.0 / rate_limit)
         
         # Initial search using places_nearby
         response = gmaps.places_nearby(
@@ -210,18 +244,18 @@ def fetch_places_for_keyword(gmaps: googlemaps.Client, keyword: str, location: T
                     places.extend(response['results'])
                     
             except googlemaps.exceptions.ApiError as e:
-                logging.warning(f"API error during pagination for '{keyword}': {e}")
+                logging.warning("API error during pagination for '%s': %s", keyword, e)
                 break
     
     except googlemaps.exceptions.ApiError as e:
-        logging.warning(f"API error fetching places for keyword '{keyword}': {e}")
+        logging.warning("API error fetching places for keyword '%s': %s", keyword, e)
     except Exception as e:
-        logging.warning(f"Unexpected error fetching places for keyword '{keyword}': {e}")
+        logging.warning("Unexpected error fetching places for keyword '%s': %s", keyword, e)
     
     return places, api_calls
 
 
-def get_place_details(gmaps: googlemaps.Client, place_id: str, rate_limit: int = 10) -> Dict:
+def get_place_details(gmaps: googlemaps.Client, place_id: str, rate_limit: int = 10, limiter: Optional[TokenBucket] = None) -> Dict:
     """Get detailed information for a specific place with rate limiting."""
     if not place_id or not isinstance(place_id, str):
         logging.warning("Invalid place_id provided")
@@ -229,7 +263,10 @@ def get_place_details(gmaps: googlemaps.Client, place_id: str, rate_limit: int =
     
     try:
         # Rate limiting
-        time.sleep(1.0 / rate_limit)
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.0 / rate_limit)
         
         # Specify fields to control costs
         fields = [
@@ -245,10 +282,10 @@ def get_place_details(gmaps: googlemaps.Client, place_id: str, rate_limit: int =
         return response.get('result', {})
     
     except googlemaps.exceptions.ApiError as e:
-        logging.warning(f"API error fetching details for place_id '{place_id}': {e}")
+        logging.warning("API error fetching details for place_id '%s': %s", place_id, e)
         return {}
     except Exception as e:
-        logging.warning(f"Unexpected error fetching details for place_id '{place_id}': {e}")
+        logging.warning("Unexpected error fetching details for place_id '%s': %s", place_id, e)
         return {}
 
 
@@ -295,6 +332,50 @@ def extract_place_info(place_details: Dict, category: str) -> Dict:
     return info
 
 
+# Output columns, in the order extract_place_info builds them
+PLACE_COLUMNS = [
+    'place_id', 'name', 'category', 'address', 'latitude', 'longitude',
+    'rating', 'review_count', 'website', 'types', 'is_open_now'
+]
+
+
+def build_places_frame(place_details_list: List[Dict], categories: List[str]) -> pd.DataFrame:
+    """Columnar equivalent of extract_place_info over many places at once.
+    
+    Missing fields come out as NaN rather than '', which writes the same
+    empty CSV cells.
+    """
+    raw = pd.json_normalize(place_details_list, sep='_')
+    
+    def column(name: str) -> pd.Series:
+        if name in raw.columns:
+            return raw[name]
+        return pd.Series(float('nan'), index=raw.index, dtype=object)
+    
+    # Coordinates are kept only when both are numeric and in range
+    lats = pd.to_numeric(column('geometry_location_lat'), errors='coerce')
+    lngs = pd.to_numeric(column('geometry_location_lng'), errors='coerce')
+    # Same bounds as validate_coordinates; NaN compares False, so missing
+    # or non-numeric values are dropped too
+    valid = lats.between(-90, 90) & lngs.between(-180, 180)
+    
+    # All columns go to the constructor at once instead of being inserted
+    # into an empty frame one by one
+    return pd.DataFrame({
+        'place_id': column('place_id').fillna(''),
+        'name': sanitize_column(column('name').fillna(''), 200),
+        'category': sanitize_column(pd.Series(categories, index=raw.index, dtype=object), 50),
+        'address': sanitize_column(column('formatted_address').fillna(''), 300),
+        'latitude': lats.where(valid),
+        'longitude': lngs.where(valid),
+        'rating': column('rating'),
+        'review_count': pd.to_numeric(column('user_ratings_total'), errors='coerce').fillna(0).astype(int),
+        'website': column('website'),
+        'types': sanitize_column(column('type').fillna(''), 50),
+        'is_open_now': column('opening_hours_open_now'),
+    }, columns=PLACE_COLUMNS)
+
+
 def main():
     """Main execution function."""
     # Setup logging first
@@ -325,42 +406,67 @@ def main():
     logging.info(f"Loaded {len(queries_df)} search queries")
     logging.info("")
     
-    # Dictionary to store unique places by place_id
-    unique_places = {}
+    # Raw details responses of the places found, with the matching categories
+    place_details_list = []
+    place_categories = []
     
     # Counters for API calls
     text_search_calls = 0
     place_details_calls = 0
     
+    # Same average budget as the old per-call sleep of 1.0 / rate_limit seconds
+    limiter = TokenBucket(rate=rate_limit)
+    
     # Process each query
     logging.info("Fetching places...")
-    for _, row in tqdm(queries_df.iterrows(), total=len(queries_df), desc="Processing queries"):
-        keyword = row['keyword']
-        category = row['category']
+    # Plain arrays; iterrows would build a Series for every row
+    keywords = queries_df['keyword'].to_numpy()
+    categories = queries_df['category'].to_numpy()
+    
+    with cancelling_executor(MAX_WORKERS) as executor:
+        # Every keyword search is submitted up front so they run concurrently;
+        # results are still handled below in query order
+        search_futures = [
+            executor.submit(fetch_places_for_keyword, gmaps, keyword, location, radius, rate_limit, limiter)
+            for keyword in keywords
+        ]
         
-        # Fetch places for this keyword
-        places, api_calls = fetch_places_for_keyword(gmaps, keyword, location, radius, rate_limit)
-        text_search_calls += api_calls
+        # Phase 1: collect every place_id across all keywords, keeping the
+        # category of the query that found it first
+        all_places: Dict[str, str] = {}
+        for category, future in tqdm(zip(categories, search_futures),
+                                     total=len(search_futures), desc="Processing queries"):
+            places, api_calls = future.result()
+            text_search_calls += api_calls
+            
+            for place in places:
+                place_id = place.get('place_id')
+                if place_id and place_id not in all_places:
+                    all_places[place_id] = category
+        
+        # Phase 2: one details lookup per unique place, run on the pool and
+        # handled in first-seen order
+        logging.info(f"Unique places found by search: {len(all_places)}")
+        detail_futures = [
+            executor.submit(get_place_details, gmaps, place_id, rate_limit, limiter)
+            for place_id in all_places
+        ]
         
-        # Process each place
-        for place in places:
-            place_id = place.get('place_id')
+        for (place_id, category), future in tqdm(zip(all_places.items(), detail_futures),
+                                                 total=len(detail_futures), desc="Place details"):
+            # Get detailed information
+            place_details = future.result()
+            place_details_calls += 1
             
-            # Skip if we've already processed this place
-            if place_id and place_id not in unique_places:
-                # Get detailed information
-                place_details = get_place_details(gmaps, place_id, rate_limit)
-                place_details_calls += 1
-                
-                if place_details:
-                    # Extract and store information
-                    place_info = extract_place_info(place_details, category)
-                    unique_places[place_id] = place_info
+            if place_details:
+                # Store the raw response; fields are extracted column-wise below
+                place_details_list.append(place_details)
+                place_categories.append(category)
     
     logging.info("")
     logging.info("=" * 40)
     logging.info("Summary:")
-    logging.info(f"Total unique places found: {len(unique_places)}")
+    logging.info(f"Total unique places found: {len(place_details_list)}")
     logging.info(f"Total API calls made: {text_search_calls + place_details_calls}")
     logging.info(f"  - Text Search calls: {text_search_calls}")
     logging.info(f"  - Place Details calls: {place_details_calls}")
@@ -378,8 +484,8 @@ def main():
     logging.info("")
     
     # Convert to DataFrame and save with timestamp
-    if unique_places:
-        df = pd.DataFrame.from_dict(unique_places, orient='index')
+    if place_details_list:
+        df = build_places_frame(place_details_list, place_categories)
         
         # Generate secure filename with timestamp
         timestamp = time.strftime("%Y%m%d_%H%M%S")
@@ -387,7 +493,7 @@ def main():
         
         # Save with error handling
         try:
-            df.to_csv(output_file, index=False)
+            write_market_csv(df, output_file)
             logging.info(f"Results saved to: {output_file}")
         except Exception as e:
             logging.error(f"Error saving results: {e}")
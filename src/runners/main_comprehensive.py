@@ -5,17 +5,30 @@ Uses grid-based search strategy to maximize coverage
 """
 
 import os
+import re
+import sys
 import csv
 import time
 import logging
+from concurrent.futures import as_completed
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Tuple
 from collections import defaultdict
+from pathlib import Path
 
 from dotenv import load_dotenv
 import googlemaps
-import pandas as pd
 from tqdm import tqdm
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.utils.common import (
+    ResponseCache, TokenBucket, build_requests_session, cancelling_executor, finalize_output,
+    zone_containment
+)
 
 # Configure logging
 logging.basicConfig(
@@ -26,18 +39,27 @@ logging.basicConfig(
 # Load environment variables
 load_dotenv()
 
+# Nearby Searches in flight at once; the shared TokenBucket keeps the overall
+# request rate at the same budget as the old serial loop
+MAX_WORKERS = 10
+
+# Results per Nearby Search page; a shorter page is the last one
+SEARCH_PAGE_SIZE = 20
+
 
 def load_search_zones(zones_file='search_zones.csv'):
     """Load search zones from CSV file."""
-    zones = []
     try:
-        df = pd.read_csv(zones_file)
-        for _, row in df.iterrows():
-            zones.append({
-                'name': row['zone_name'],
-                'location': (float(row['latitude']), float(row['longitude'])),
-                'radius': int(row['radius'])
-            })
+        # A handful of small rows; no DataFrame needed
+        with open(zones_file, newline='', encoding='utf-8') as f:
+            zones = [
+                {
+                    'name': row['zone_name'],
+                    'location': (float(row['latitude']), float(row['longitude'])),
+                    'radius': int(row['radius'])
+                }
+                for row in csv.DictReader(f)
+            ]
         logging.info(f"Loaded {len(zones)} search zones")
         return zones
     except Exception as e:
@@ -50,26 +72,50 @@ def load_search_zones(zones_file='search_zones.csv'):
         }]
 
 
+def find_containing_zones(zones):
+    """For each zone, the indices of the zones whose circle contains it entirely."""
+    if not zones:
+        return []
+    inside = zone_containment(
+        [zone['location'][0] for zone in zones],
+        [zone['location'][1] for zone in zones],
+        [zone['radius'] for zone in zones]
+    )
+    return [np.flatnonzero(row).tolist() for row in inside]
+
+
 def load_queries_with_categories(queries_file='queries_comprehensive_optimized.csv'):
-    """Load queries with category and sub-category information."""
+    """Load queries with category and sub-category information.
+    
+    Returns one dict per CSV row (keyword, category, sub_category, ...), or an
+    empty list if the file cannot be read.
+    """
     try:
-        df = pd.read_csv(queries_file)
-        logging.info(f"Loaded {len(df)} search queries with categories")
-        return df
+        with open(queries_file, newline='', encoding='utf-8') as f:
+            queries = list(csv.DictReader(f))
+        logging.info(f"Loaded {len(queries)} search queries with categories")
+        return queries
     except Exception as e:
         logging.error(f"Error loading queries: {e}")
-        return pd.DataFrame()
+        return []
 
 
-def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10):
-    """Fetch places for a specific zone and keyword combination."""
+def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10, limiter=None):
+    """Fetch places for a specific zone and keyword combination.
+    
+    Pass a shared limiter when calling from several threads; without one each
+    call sleeps 1.0 / rate_limit seconds first.
+    """
     places = []
     api_calls = 0
     max_pages = 3  # Limit to prevent excessive API usage
     
     try:
         # Rate limiting
-        time.sleep(1.0 / rate_limit)
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.0 / rate_limit)
         
         # Initial search
         response = gmaps.places_nearby(
@@ -118,11 +164,36 @@ def fetch_places_for_zone_and_keyword(gmaps, keyword, zone, rate_limit=10):
     return places, api_calls
 
 
-def get_place_details_enhanced(gmaps, place_id, rate_limit=10):
-    """Get detailed information for a place with enhanced fields."""
-    try:
-        time.sleep(1.0 / rate_limit)
-        
+# Fields the Nearby Search results already carry; main reuses them as-is
+# instead of requesting them again from Place Details. opening_hours here
+# only has open_now, which is all the output uses
+SEARCH_RESULT_FIELDS = (
+    'place_id', 'name', 'geometry', 'vicinity', 'business_status',
+    'rating', 'user_ratings_total', 'price_level', 'opening_hours'
+)
+
+# Place Details fields the Nearby Search response lacks; the Contact ones
+# are billed per SKU on top of Basic Data
+DETAILS_ONLY_FIELDS = ('formatted_address', 'website', 'formatted_phone_number')
+
+# Output CSV columns, in the order process_place_for_output builds them
+OUTPUT_FIELDS = (
+    'place_id', 'name', 'category', 'sub_category', 'latitude', 'longitude',
+    'address', 'vicinity', 'rating', 'review_count', 'website', 'phone',
+    'price_level', 'types', 'is_operational', 'search_zone', 'search_keyword',
+    'is_open_now', 'timestamp'
+)
+
+
+def get_place_details_enhanced(gmaps, place_id, rate_limit=10, limiter=None, cache=None, fields=None):
+    """Get detailed information for a place with enhanced fields.
+    
+    Takes the same optional shared limiter as fetch_places_for_zone_and_keyword.
+    With a cache, a place looked up before is answered without an API call.
+    `fields` narrows the request; by default every output field is requested.
+    Returns None if the request fails.
+    """
+    if fields is None:
         # Request specific fields (removed 'type' since it's often None in details API)
         fields = [
             'place_id', 'name', 'formatted_address', 'geometry',
@@ -130,78 +201,107 @@ def get_place_details_enhanced(gmaps, place_id, rate_limit=10):
             'opening_hours', 'formatted_phone_number', 'price_level',
             'business_status', 'vicinity'
         ]
+    else:
+        fields = list(fields)
+    # The field list is part of the key, so changing it misses the cache
+    cache_args = (place_id, ','.join(sorted(fields)))
+    
+    if cache is not None:
+        cached = cache.get('details', *cache_args)
+        if cached is not None:
+            return cached
+    
+    try:
+        if limiter is not None:
+            limiter.acquire()
+        else:
+            time.sleep(1.0 / rate_limit)
         
         response = gmaps.place(
             place_id=place_id,
             fields=fields
         )
         
-        return response.get('result', {})
+        result = response.get('result', {})
+        if cache is not None:
+            cache.set('details', result, *cache_args)
+        return result
     
     except Exception as e:
         logging.warning(f"Error fetching details for place_id '{place_id}': {e}")
-        return {}
+        return None
+
+
+# Relevance filter vocabularies, compiled once at import
+IRRELEVANT_TYPES = frozenset([
+    'loading_dock',
+    'parking',
+    'gas_station',
+    'atm',
+    'bus_station',
+    'subway_station',
+    'train_station',
+    'airport',
+    'lodging',
+    'storage',
+    'warehouse',
+    'construction',
+    'industrial',
+    'utility',
+    'government',
+    'embassy',
+    'cemetery',
+    'funeral_home',
+    'place_of_worship'
+])
+
+# Matched anywhere in the lowercased name, like the old substring checks
+IRRELEVANT_NAME_RE = re.compile('|'.join(map(re.escape, [
+    'loading dock',
+    'parking lot',
+    'parking area',
+    'gas station',
+    'petrol station',
+    'atm',
+    'bank atm',
+    'construction site',
+    'warehouse',
+    'storage facility'
+])))
+
+
+# Upper bound on memoized (name, types) results per classifier
+CLASSIFY_CACHE_SIZE = 8192
 
 
 def is_relevant_business(name, business_types):
     """Filter out irrelevant business types that are not useful for pet wellness market analysis."""
-    name_lower = name.lower()
-    types_lower = [t.lower() for t in business_types] if business_types else []
-    
-    # Irrelevant business types to filter out
-    irrelevant_types = [
-        'loading_dock',
-        'parking',
-        'gas_station',
-        'atm',
-        'bus_station',
-        'subway_station',
-        'train_station',
-        'airport',
-        'lodging',
-        'storage',
-        'warehouse',
-        'construction',
-        'industrial',
-        'utility',
-        'government',
-        'embassy',
-        'cemetery',
-        'funeral_home',
-        'place_of_worship'
-    ]
-    
-    # Irrelevant name patterns
-    irrelevant_name_patterns = [
-        'loading dock',
-        'parking lot',
-        'parking area',
-        'gas station',
-        'petrol station',
-        'atm',
-        'bank atm',
-        'construction site',
-        'warehouse',
-        'storage facility'
-    ]
-    
+    return _is_relevant_business(name, tuple(business_types) if business_types else ())
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def _is_relevant_business(name, business_types):
+    """is_relevant_business memoized per (name, types tuple)."""
     # Check if any irrelevant types match
-    for irrelevant_type in irrelevant_types:
-        if irrelevant_type in types_lower:
-            return False
+    if not IRRELEVANT_TYPES.isdisjoint(t.lower() for t in business_types):
+        return False
     
     # Check if any irrelevant name patterns match
-    for pattern in irrelevant_name_patterns:
-        if pattern in name_lower:
-            return False
-    
-    return True
+    return IRRELEVANT_NAME_RE.search(name.lower()) is None
 
 
 def classify_business(name, business_types, category, sub_category):
     """Enhanced classification based on name and types."""
+    return _classify_business(
+        name, tuple(business_types) if business_types else (), category, sub_category
+    )
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def _classify_business(name, business_types, category, sub_category):
+    """classify_business memoized per (name, types tuple, category, sub_category)."""
     name_lower = name.lower()
-    types_lower = [t.lower() for t in business_types] if business_types else []
+    types_lower = [t.lower() for t in business_types]
     
     # Refine competitor sub-categories
     if category == 'Competitor':
@@ -274,8 +374,14 @@ def process_place_for_output(place_details, category, sub_category, search_info,
     }
 
 
-def main():
-    """Main execution function."""
+def main(zones_file='search_zones.csv', queries_file='queries_comprehensive_optimized.csv', use_cache=True):
+    """Main execution function.
+    
+    Place Details responses are cached in CACHE_PATH across runs; with
+    use_cache=False every lookup goes to the API and nothing is cached.
+    
+    Returns the path of the results CSV, or None if the run could not start.
+    """
     print("🐾 Comprehensive Pet Wellness Market Analysis Scraper")
     print("=" * 60)
     
@@ -283,107 +389,202 @@ def main():
     api_key = os.getenv('GOOGLE_MAPS_API_KEY')
     if not api_key or api_key == 'YOUR_API_KEY_HERE':
         print("❌ Error: Please set your Google Maps API key in .env file")
-        return
+        return None
     
-    # Initialize Google Maps client
-    gmaps = googlemaps.Client(key=api_key)
+    # Initialize Google Maps client; every request of the run shares one
+    # pooled keep-alive session
+    gmaps = googlemaps.Client(key=api_key, requests_session=build_requests_session(MAX_WORKERS))
     
     # Load search zones and queries
-    zones = load_search_zones()
-    queries_df = load_queries_with_categories()
+    zones = load_search_zones(zones_file)
+    queries = load_queries_with_categories(queries_file)
     
-    if queries_df.empty:
+    if not queries:
         print("❌ Error: No queries loaded")
-        return
+        return None
     
     print(f"📍 Search zones: {len(zones)}")
-    print(f"🔍 Search queries: {len(queries_df)}")
-    print(f"💡 Total searches: {len(zones) * len(queries_df)}")
+    print(f"🔍 Search queries: {len(queries)}")
+    print(f"💡 Total searches: {len(zones) * len(queries)}")
     print()
     
-    # Master dictionary to store unique places
-    unique_places = {}
+    # Rows are streamed to the output file as they are produced, so a failed
+    # run keeps every place fetched so far
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_file = f'jakarta_pet_market_analysis_{timestamp}.csv'
+    # Line buffered: every finished row reaches the file immediately
+    output = open(output_file, 'w', buffering=1, newline='', encoding='utf-8')
+    writer = csv.DictWriter(output, fieldnames=OUTPUT_FIELDS)
+    writer.writeheader()
+    
+    places_written = 0
     
     # Statistics
     stats = defaultdict(int)
     api_calls = 0
     
-    # Process each zone
-    for zone in zones:
-        print(f"\n🗺️  Processing zone: {zone['name']}")
-        print(f"   Location: {zone['location']}")
-        print(f"   Radius: {zone['radius']}m")
+    # Same average budget as the old per-call sleep of 1.0 / rate_limit seconds
+    limiter = TokenBucket(rate=10)
+    cache = ResponseCache() if use_cache else None
+    
+    # A zone lying inside another needs no search for a keyword when the
+    # containing zone's search already returned every match (its last page
+    # was short, so neither the page cap nor an error cut it off). Only the
+    # outermost containers are checked: they are never skipped themselves,
+    # and any zone they contain is covered too
+    containers = find_containing_zones(zones)
+    outermost = [[c for c in zone_containers if not containers[c]] for zone_containers in containers]
+    
+    with output, cancelling_executor(MAX_WORKERS) as executor:
+        def search(zone_index, query_index):
+            return executor.submit(
+                fetch_places_for_zone_and_keyword,
+                gmaps, queries[query_index]['keyword'], zones[zone_index],
+                rate_limit=10, limiter=limiter
+            )
         
-        # Process each query in this zone
-        zone_progress = tqdm(queries_df.iterrows(), 
-                           total=len(queries_df),
-                           desc=f"  {zone['name']}")
+        # Searches of zones with no container are submitted up front so they
+        # run concurrently. A contained zone's search is only submitted (or
+        # skipped, as None) once its containers' results are in, so no
+        # worker sits blocked waiting on another search
+        searches = {}
+        dependents = defaultdict(list)
+        for zone_index in range(len(zones)):
+            for query_index in range(len(queries)):
+                key = (zone_index, query_index)
+                if outermost[zone_index]:
+                    for container in outermost[zone_index]:
+                        dependents[(container, query_index)].append(key)
+                else:
+                    searches[key] = search(*key)
         
-        for _, query in zone_progress:
-            keyword = query['keyword']
-            category = query['category']
-            sub_category = query['sub_category']
-            
-            # Update progress bar
-            zone_progress.set_postfix({'keyword': keyword[:20]})
+        remaining = {key: len(outermost[key[0]]) for keys in dependents.values() for key in keys}
+        container_keys = {searches[key]: key for key in dependents}
+        for future in as_completed(container_keys):
+            places, _ = future.result()
+            covered = len(places) % SEARCH_PAGE_SIZE != 0
+            for key in dependents[container_keys[future]]:
+                if key in searches:
+                    continue
+                remaining[key] -= 1
+                if covered:
+                    searches[key] = None
+                elif not remaining[key]:
+                    searches[key] = search(*key)
+        
+        # Results are handled below in zone and query order
+        zone_futures = [
+            [searches[(zone_index, query_index)] for query_index in range(len(queries))]
+            for zone_index in range(len(zones))
+        ]
+        
+        # Every place_id the searches returned, relevant or not; later
+        # sightings of a place cost one set lookup
+        seen_ids = set()
+        # First sighting of each relevant place_id, in the order places were
+        # first seen, with its queued details lookup
+        pending_details = {}
+        
+        # Process each zone
+        for zone, futures in zip(zones, zone_futures):
+            print(f"\n🗺️  Processing zone: {zone['name']}")
+            print(f"   Location: {zone['location']}")
+            print(f"   Radius: {zone['radius']}m")
             
-            # Fetch places
-            places, calls = fetch_places_for_zone_and_keyword(
-                gmaps, keyword, zone, rate_limit=10
-            )
-            api_calls += calls
-            stats[f'searches_{category}'] += 1
+            # Process each query in this zone
+            zone_progress = tqdm(zip(queries, futures),
+                               total=len(queries),
+                               desc=f"  {zone['name']}")
             
-            # Process each place
-            for place in places:
-                place_id = place.get('place_id')
+            for query, future in zone_progress:
+                keyword = query['keyword']
+                category = query['category']
+                sub_category = query['sub_category']
                 
-                if place_id and place_id not in unique_places:
-                    # Get the types from the search response
-                    search_types = place.get('search_types', [])
-                    
-                    # Get detailed information
-                    details = get_place_details_enhanced(gmaps, place_id)
-                    api_calls += 1
+                # Update progress bar
+                zone_progress.set_postfix({'keyword': keyword[:20]})
+                
+                if future is None:
+                    stats['searches_skipped'] += 1
+                    continue
+                places, calls = future.result()
+                api_calls += calls
+                stats[f'searches_{category}'] += 1
+                
+                # Pass 1: record where each place was first found, with the
+                # types from the search response, and queue its details
+                # lookup on the pool right away
+                for place in places:
+                    place_id = place.get('place_id')
                     
-                    if details:
-                        # Check if this is a relevant business using search types
-                        name = details.get('name', '')
+                    if place_id and place_id not in seen_ids:
+                        seen_ids.add(place_id)
                         
-                        if is_relevant_business(name, search_types):
-                            # Process and store, passing the search types
-                            place_info = process_place_for_output(
-                                details, category, sub_category,
-                                {'zone': zone['name'], 'keyword': keyword},
-                                search_types
-                            )
-                            unique_places[place_id] = place_info
-                            stats[f'found_{category}'] += 1
-                            stats[f'found_{sub_category}'] += 1
-                        else:
+                        # Get the types from the search response
+                        search_types = place.get('search_types', [])
+                        
+                        # The search response already has the name and types,
+                        # so irrelevant places are dropped without a details call
+                        if not is_relevant_business(place.get('name', ''), search_types):
                             stats['filtered_irrelevant'] += 1
+                            continue
+                        
+                        # Get only the details the search response lacks
+                        pending_details[place_id] = (
+                            executor.submit(
+                                get_place_details_enhanced,
+                                gmaps, place_id, limiter=limiter, cache=cache, fields=DETAILS_ONLY_FIELDS
+                            ),
+                            {field: place[field] for field in SEARCH_RESULT_FIELDS if field in place},
+                            search_types,
+                            {'zone': zone['name'], 'keyword': keyword},
+                            category,
+                            sub_category
+                        )
+        
+        # Pass 2: details are handled in first-seen order, so the output
+        # matches the serial run
+        print(f"\n📋 Relevant unique places found by search: {len(pending_details)}")
+        for future, search_fields, search_types, search_info, category, sub_category in tqdm(
+                pending_details.values(), total=len(pending_details), desc="  Place details"):
+            details = future.result()
+            api_calls += 1
+            
+            # Only a failed lookup drops the place; a place with no address,
+            # website or phone still has everything from the search response
+            if details is not None:
+                # Complete the details with the fields from the search response
+                details = {**search_fields, **details}
+                
+                # Process and store, passing the search types
+                place_info = process_place_for_output(
+                    details, category, sub_category, search_info, search_types
+                )
+                writer.writerow(place_info)
+                places_written += 1
+                stats[f'found_{category}'] += 1
+                stats[f'found_{sub_category}'] += 1
     
-    # Convert to DataFrame
-    df = pd.DataFrame.from_dict(unique_places, orient='index')
-    
-    # Sort by category and sub_category for better organization
-    if not df.empty:
-        df = df.sort_values(['category', 'sub_category', 'rating'], 
-                          ascending=[True, True, False])
+    # Cached details cost nothing
+    if cache is not None:
+        api_calls -= cache.hits['details']
+        cache.close()
     
-    # Save results
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_file = f'jakarta_pet_market_analysis_{timestamp}.csv'
-    df.to_csv(output_file, index=False, encoding='utf-8')
+    # The final sort needs every row, so it is applied once the run is complete
+    df = finalize_output(output_file, OUTPUT_FIELDS)
     
     # Print summary
     print("\n" + "=" * 60)
     print("📊 ANALYSIS SUMMARY")
     print("=" * 60)
     
-    print(f"\n🎯 Total unique places found: {len(unique_places)}")
+    print(f"\n🎯 Total unique places found: {places_written}")
     print(f"📞 Total API calls made: {api_calls}")
     print(f"🚫 Irrelevant results filtered: {stats.get('filtered_irrelevant', 0)}")
+    if stats['searches_skipped']:
+        print(f"⏭️  Searches skipped inside an exhausted containing zone: {stats['searches_skipped']}")
+    if cache is not None:
+        print(f"💾 Place details cache hits: {cache.hits['details']}")
     
     # Category breakdown
     if not df.empty:
@@ -407,7 +608,10 @@ def main():
     print("   - X field: longitude")
     print("   - Y field: latitude")
     print("   - CRS: EPSG:4326 (WGS 84)")
+    
+    return output_file
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Usage: main_comprehensive.py [--no-cache]
+    main(use_cache='--no-cache' not in sys.argv[1:])
\ No newline at end of file
@@ -62,7 +62,7 @@ def run_batch_analysis():
     
     # Load zones and queries
     zones = load_search_zones()
-    queries_df = load_queries_with_categories()
+    queries = load_queries_with_categories()
     
     # Load progress
     progress = load_progress()
@@ -88,7 +88,7 @@ def run_batch_analysis():
         zone_api_calls = 0
         
         # Process each query
-        for _, query in queries_df.iterrows():
+        for query in queries:
             keyword = query['keyword']
             category = query['category']
             sub_category = query['sub_category']
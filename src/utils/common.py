@@ -0,0 +1,357 @@
+"""
+Helpers shared by the extractors, runners and merge scripts.
+"""
+import os
+import csv
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Prefer the multithreaded Arrow CSV writer when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pc = pacsv = None
+
+# Persistent response cache so re-runs do not pay for the same API calls
+# twice; entries older than CACHE_MAX_AGE seconds are fetched again
+CACHE_PATH = '.gmaps_cache.sqlite3'
+CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+# Column dtypes for the market/community CSVs; unlisted columns are inferred
+CSV_DTYPES = {
+    'place_id': 'string',
+    'name': 'string',
+    'category': 'category',
+    'sub_category': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'address': 'string',
+    'vicinity': 'string',
+    'rating': 'float32',
+    'review_count': 'Int32',
+    'website': 'string',
+    'phone': 'string',
+    'types': 'string',
+    'is_operational': 'boolean',
+    'search_zone': 'category',
+    'search_keyword': 'category',
+    'is_open_now': 'boolean',
+    'timestamp': 'string',
+    'popularity_score': 'float32',
+    'buffer_radius_m': 'float32',
+}
+
+# Rows per Arrow CSV write batch; larger batches mean fewer, bigger writes
+CSV_WRITE_BATCH_ROWS = 65536
+
+# Numeric columns of the streamed extractor output; missing values become
+# NaN and are written back as empty fields. rating stays float64 so scores
+# computed from it match the per-row formula
+NUMERIC_DTYPES = {
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'rating': 'float64',
+    'review_count': 'Int32',
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all API calls.
+    
+    Tokens refill at `rate` per second up to `capacity`; a call only blocks
+    once the bucket is empty, so time spent waiting on the network counts
+    toward the spacing instead of adding to it.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Take one token, sleeping until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A negative balance reserves a future token for this caller
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ResponseCache:
+    """sqlite3-backed store of Google Maps responses, safe to share across threads.
+    
+    Entries are keyed by a sha256 of the request kind and its parameters and
+    expire after max_age seconds, so places that change are eventually re-fetched.
+    """
+    
+    def __init__(self, path=CACHE_PATH, max_age=CACHE_MAX_AGE):
+        self.max_age = max_age
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = defaultdict(int)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, response_json TEXT NOT NULL, fetched_at INTEGER NOT NULL)'
+            )
+    
+    @staticmethod
+    def _key(kind, parts):
+        return hashlib.sha256('|'.join(map(str, (kind,) + parts)).encode('utf-8')).hexdigest()
+    
+    def get(self, kind, *parts):
+        """Return the cached response for this request, or None if missing or expired."""
+        key = self._key(kind, parts)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response_json FROM responses WHERE key = ? AND fetched_at >= ?',
+                (key, int(time.time() - self.max_age))
+            ).fetchone()
+            if row is None:
+                return None
+            self.hits[kind] += 1
+        return json.loads(row[0])
+    
+    def set(self, kind, value, *parts):
+        """Store a response for this request."""
+        key = self._key(kind, parts)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?)',
+                (key, json.dumps(value), int(time.time()))
+            )
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _TrackingExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that keeps every future it hands out."""
+    
+    def __init__(self, max_workers):
+        super().__init__(max_workers=max_workers)
+        self.submitted = []
+    
+    def submit(self, fn, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        self.submitted.append(future)
+        return future
+
+
+@contextmanager
+def cancelling_executor(max_workers):
+    """ThreadPoolExecutor that drops its queued calls if the block raises.
+    
+    Leaving a plain `with ThreadPoolExecutor()` block waits for every
+    submitted call, so an error or Ctrl-C would still make (and pay for)
+    all the queued API requests before the run stopped. The queued futures
+    are cancelled one by one, since shutdown(cancel_futures=True) needs
+    Python 3.9.
+    """
+    executor = _TrackingExecutor(max_workers)
+    try:
+        yield executor
+    except BaseException:
+        for future in executor.submitted:
+            future.cancel()
+        executor.shutdown(wait=False)
+        raise
+    executor.shutdown()
+
+
+def build_requests_session(pool_size):
+    """Keep-alive session for googlemaps.Client with one pooled connection per worker.
+    
+    A pool smaller than the number of threads making calls drops the extra
+    connections, and each one is re-opened (new TCP + TLS handshake) on the
+    next call.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,  # Only maps.googleapis.com is ever contacted
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=3, backoff_factor=0.3)  # Connection-level errors only
+    )
+    session.mount('https://', adapter)
+    return session
+
+
+def zone_centers_m(lat, lng):
+    """Zone centers in meters on a local flat projection (fine at city scale)."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    lat0 = np.radians(lat.mean())
+    x = np.radians(lng - lng.mean()) * 6371000 * np.cos(lat0)
+    y = np.radians(lat - lat.mean()) * 6371000
+    return x, y
+
+
+def zone_containment(lat, lng, radius):
+    """Boolean matrix whose [i, j] entry says zone i's circle lies entirely within zone j's.
+    
+    Of two identical circles only the earlier one counts as the container,
+    so no zone is ever reported inside itself or a copy of itself.
+    """
+    x, y = zone_centers_m(lat, lng)
+    r = np.asarray(radius, dtype=np.float64)
+    dist = np.hypot(x[:, np.newaxis] - x, y[:, np.newaxis] - y)
+    inside = dist + r[:, np.newaxis] <= r[np.newaxis, :]
+    index = np.arange(len(r))
+    inside &= ~(inside.T & (index[np.newaxis, :] > index[:, np.newaxis]))
+    np.fill_diagonal(inside, False)
+    return inside
+
+
+def drop_unused_categories(df):
+    """Drop categories no longer used by any row, e.g. after deduplication."""
+    cat_cols = df.select_dtypes('category').columns
+    return df.assign(**{col: df[col].cat.remove_unused_categories() for col in cat_cols})
+
+
+def align_categories(left, right):
+    """Give the categorical columns of both frames the same categories.
+    
+    concat only keeps a categorical dtype when both sides share their
+    categories; otherwise the column falls back to object strings.
+    """
+    dtypes = {}
+    for col in left.columns.intersection(right.columns):
+        if isinstance(left[col].dtype, pd.CategoricalDtype) and isinstance(right[col].dtype, pd.CategoricalDtype):
+            categories = left[col].cat.categories.union(right[col].cat.categories)
+            dtypes[col] = pd.CategoricalDtype(categories)
+    return left.astype(dtypes), right.astype(dtypes)
+
+
+def write_market_csv(df, output_file):
+    """Write a frame to CSV without the index.
+    
+    With pyarrow the text differs from DataFrame.to_csv in two ways: every
+    string value is quoted (Arrow has no minimal quoting), and whole-number
+    floats lose their trailing .0 (5.0 is written as 5). Booleans are still
+    written as True/False, as pandas writes them. pandas reads both forms
+    back to the same values.
+    """
+    if pacsv is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns Arrow can't infer; use pandas instead
+            table = None
+        if table is not None:
+            # Arrow would write booleans as true/false
+            for i, field in enumerate(table.schema):
+                if pa.types.is_boolean(field.type):
+                    table = table.set_column(i, field.name, pc.if_else(table.column(i), 'True', 'False'))
+            pacsv.write_csv(table, output_file, pacsv.WriteOptions(batch_size=CSV_WRITE_BATCH_ROWS))
+            return
+    
+    df.to_csv(output_file, index=False)
+
+
+def write_market_data(df, output_file, output_format='csv'):
+    """Write a frame as CSV or, with output_format='parquet', as zstd Parquet.
+    
+    Parquet keeps the column dtypes, so categorical columns are stored
+    dictionary-encoded and come back as categoricals.
+    """
+    if output_format == 'parquet':
+        df.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
+    else:
+        write_market_csv(df, output_file)
+
+
+def write_csv_rows(path, rows):
+    """Write a list of same-keyed dicts as a CSV file with a header row."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def find_latest_file(prefix, suffix='.csv'):
+    """Name of the most recently modified prefix*suffix file in the working directory, or None."""
+    with os.scandir('.') as entries:
+        latest = max(
+            (entry for entry in entries
+             if entry.name.startswith(prefix) and entry.name.endswith(suffix)),
+            key=lambda entry: entry.stat().st_mtime,
+            default=None
+        )
+    return None if latest is None else latest.name
+
+
+def load_saved_place_ids(output_file):
+    """Return the place_ids already written to an output file, for resuming it.
+    
+    A run that was killed can leave a partial last row; it is cut off here,
+    so it is neither counted as saved nor glued to the next appended row.
+    """
+    with open(output_file, 'r+b') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+    with open(output_file, newline='', encoding='utf-8') as f:
+        return {row['place_id'] for row in csv.DictReader(f) if row.get('place_id')}
+
+
+def _categorical_sort_key(column):
+    """Sort text columns by categorical codes; categories are sorted, so the order is unchanged."""
+    if pd.api.types.is_numeric_dtype(column):
+        return column
+    return column.astype('category')
+
+
+def finalize_output(output_file, columns, score=None):
+    """Sort the rows streamed to output_file, then rewrite it in place.
+    
+    `columns` are the output's columns; `score`, if given, takes the typed
+    frame and returns it with computed columns filled in before sorting.
+    The sorted copy is written next to the file and moved over it with
+    os.replace, so the streamed rows are never lost halfway through.
+    """
+    # Text columns are read as-is so they are written back exactly as
+    # streamed; only empty numeric fields become NaN, and floats are parsed
+    # round-trip so coordinates keep every digit
+    df = pd.read_csv(
+        output_file,
+        dtype={col: str for col in columns if col not in NUMERIC_DTYPES},
+        keep_default_na=False,
+        na_values={col: [''] for col in NUMERIC_DTYPES},
+        float_precision='round_trip',
+        encoding='utf-8'
+    )
+    
+    # Sort by category and sub_category for better organization
+    if not df.empty:
+        df = df.astype(NUMERIC_DTYPES)
+        if score is not None:
+            df = score(df)
+        # Unrated places stay first within a sub-category, as before
+        df = df.sort_values(['category', 'sub_category', 'rating'], 
+                          ascending=[True, True, False], na_position='first',
+                          key=_categorical_sort_key)
+    
+    write_market_csv(df, output_file + '.tmp')
+    os.replace(output_file + '.tmp', output_file)
+    return df
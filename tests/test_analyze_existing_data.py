@@ -0,0 +1,45 @@
+"""
+Unit tests for the existing dataset analysis.
+"""
+import logging
+import sys
+from pathlib import Path
+import pytest
+
+# Add the parent directory to sys.path so we can import the analyzer
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.analyzers import analyze_existing_data
+
+
+class TestAnalyzeExistingData:
+    """Test the category breakdown of the existing dataset."""
+
+    @pytest.fixture
+    def run(self, tmp_path, monkeypatch, caplog):
+        """Fixture running the analysis on a small dataset in tmp_path and returning its log."""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'jakarta_pet_market_CLEAN_20250805_102308.csv').write_text(
+            'place_id,name,category,sub_category,latitude,longitude,search_zone\n'
+            'p1,Vet A,Competitor,Vet,-6.2,106.8,Zone_A\n'
+            'p2,Vet B,Competitor,,-6.2,106.8,Zone_A\n'
+            'p3,Mall,Affluence_Proxy,Mall,-6.3,106.9,Zone_B\n'
+            'p4,Unknown,,Park,-6.3,106.9,Zone_B\n',
+            encoding='utf-8'
+        )
+        caplog.set_level(logging.INFO)
+        analyze_existing_data.analyze_existing_data()
+        return caplog.text
+
+    @pytest.mark.unit
+    def test_rows_without_category_are_not_counted(self, run):
+        """Test that a missing category does not show up as a NaN category."""
+        assert '  Competitor: 2' in run
+        assert '  Affluence_Proxy: 1' in run
+        assert 'nan' not in run.lower()
+
+    @pytest.mark.unit
+    def test_competitor_total_includes_missing_sub_categories(self, run):
+        """Test that competitors without a sub-category still count towards the total."""
+        assert 'Competitor sub-categories (2 total):' in run
+        assert '  Vet: 1' in run
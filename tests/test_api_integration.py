@@ -4,7 +4,7 @@ Unit tests for Google Maps API integration functionality.
 import sys
 import time
 from pathlib import Path
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import ANY, Mock, patch, MagicMock
 import pytest
 import googlemaps
 from googlemaps.exceptions import ApiError
@@ -34,7 +34,7 @@ class TestGoogleMapsClientInitialization:
         api_key = "AIzaSyDummyTestKeyFor39CharacterString"
         client = main.initialize_maps_client(api_key)
         
-        mock_client_class.assert_called_once_with(key=api_key)
+        mock_client_class.assert_called_once_with(key=api_key, requests_session=ANY)
         mock_googlemaps_client.geocode.assert_called_once_with("test", language="en")
         assert client == mock_googlemaps_client
     
@@ -64,6 +64,15 @@ class TestGoogleMapsClientInitialization:
         
         assert exc_info.value.code == 1
 
+    @pytest.mark.unit
+    def test_initialize_maps_client_sizes_connection_pool(self):
+        """Test that the client's session keeps one connection per worker."""
+        api_key = "AIzaSyDummyTestKeyFor39CharacterString"
+        client = main.initialize_maps_client(api_key, pool_size=16)
+
+        adapter = client.session.get_adapter("https://maps.googleapis.com")
+        assert adapter._pool_maxsize == 16
+
 
 class TestFetchPlacesForKeyword:
     """Test fetching places for keywords."""
@@ -433,4 +442,34 @@ class TestAPIRateLimiting:
             assert len(sleep_calls) >= 2
             
             # Second call should use max(2, 1/rate_limit) for pagination
-            assert sleep_calls[1][0][0] == expected_delay
\ No newline at end of file
+            assert sleep_calls[1][0][0] == expected_delay
+    
+    @pytest.mark.unit
+    def test_shared_limiter_replaces_fixed_sleep(self):
+        """Test that a shared limiter is used instead of the per-call sleep."""
+        mock_gmaps = Mock()
+        mock_gmaps.places_nearby.return_value = {'results': []}
+        mock_gmaps.place.return_value = {'result': {'place_id': 'place_1'}}
+        limiter = Mock()
+        
+        with patch('time.sleep') as mock_sleep:
+            main.fetch_places_for_keyword(
+                mock_gmaps, "test", (-6.2088, 106.8456), 5000, 10, limiter
+            )
+            main.get_place_details(mock_gmaps, 'place_1', 10, limiter)
+            
+            assert limiter.acquire.call_count == 2
+            mock_sleep.assert_not_called()
+    
+    @pytest.mark.unit
+    def test_token_bucket_allows_burst_then_waits(self):
+        """Test that the token bucket only sleeps once its tokens run out."""
+        with patch('time.sleep') as mock_sleep:
+            bucket = main.TokenBucket(rate=10, capacity=2)
+            bucket.acquire()
+            bucket.acquire()
+            mock_sleep.assert_not_called()
+            
+            bucket.acquire()
+            mock_sleep.assert_called_once()
+            assert 0 < mock_sleep.call_args[0][0] <= 0.1
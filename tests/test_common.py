@@ -0,0 +1,134 @@
+"""
+Unit tests for the helpers shared by the extractors and runners.
+"""
+import os
+import sys
+import threading
+from pathlib import Path
+import pandas as pd
+import pytest
+
+# Add the parent directory to sys.path so we can import the shared helpers
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.common import cancelling_executor, find_latest_file, write_market_csv, zone_containment
+
+
+class TestCancellingExecutor:
+    """Test the executor used for API requests."""
+
+    @pytest.mark.unit
+    def test_error_cancels_queued_calls(self):
+        """Test that an error in the block drops calls that have not started yet."""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def call(i):
+            calls.append(i)
+            started.set()
+            release.wait(5)
+
+        with pytest.raises(KeyboardInterrupt):
+            with cancelling_executor(1) as executor:
+                futures = [executor.submit(call, i) for i in range(5)]
+                started.wait(5)
+                raise KeyboardInterrupt
+        release.set()
+
+        assert calls == [0]
+        assert all(future.cancelled() for future in futures[1:])
+
+    @pytest.mark.unit
+    def test_normal_exit_waits_for_all_calls(self):
+        """Test that leaving the block normally runs every submitted call."""
+        calls = []
+
+        with cancelling_executor(2) as executor:
+            for i in range(5):
+                executor.submit(calls.append, i)
+
+        assert sorted(calls) == [0, 1, 2, 3, 4]
+
+
+class TestWriteMarketCsv:
+    """Test the CSV text written for the market datasets."""
+
+    @pytest.fixture
+    def df(self):
+        """Fixture providing a frame with the column kinds of the datasets."""
+        return pd.DataFrame({
+            'name': pd.array(['Klinik A', 'Jl. 1, Jakarta'], dtype='string'),
+            'category': pd.Categorical(['Competitor', None]),
+            'rating': [5.0, 4.3],
+            'review_count': pd.array([12, None], dtype='Int32'),
+            'is_operational': pd.array([True, None], dtype='boolean'),
+            'is_open_now': [False, True],
+        })
+
+    @pytest.mark.unit
+    def test_arrow_output_format(self, df, tmp_path):
+        """Test the pinned Arrow CSV text: quoted strings, True/False booleans, 5.0 as 5."""
+        pytest.importorskip('pyarrow')
+        output_file = tmp_path / 'out.csv'
+
+        write_market_csv(df, str(output_file))
+
+        assert output_file.read_text().splitlines() == [
+            '"name","category","rating","review_count","is_operational","is_open_now"',
+            '"Klinik A","Competitor",5,12,"True","False"',
+            '"Jl. 1, Jakarta",,4.3,,,"True"',
+        ]
+
+    @pytest.mark.unit
+    def test_reads_back_like_pandas_output(self, df, tmp_path):
+        """Test that pandas reads the written file back as it reads DataFrame.to_csv output."""
+        output_file = tmp_path / 'out.csv'
+        pandas_file = tmp_path / 'pandas.csv'
+
+        write_market_csv(df, str(output_file))
+        df.to_csv(pandas_file, index=False)
+
+        pd.testing.assert_frame_equal(pd.read_csv(output_file), pd.read_csv(pandas_file))
+
+
+class TestZoneContainment:
+    """Test the zone containment shared by the runner and the coverage analysis."""
+
+    @pytest.mark.unit
+    def test_accepts_dataframe_columns(self):
+        """Test that a small zone inside a larger one is found from zone CSV columns."""
+        zones = pd.DataFrame({
+            'latitude': [-6.2088, -6.2088, -6.3],
+            'longitude': [106.8456, 106.85, 106.8456],
+            'radius': [10000, 1000, 1000],
+        })
+
+        inside = zone_containment(zones['latitude'], zones['longitude'], zones['radius'])
+
+        assert inside.tolist() == [
+            [False, False, False],
+            [True, False, False],
+            [False, False, False],
+        ]
+
+
+class TestFindLatestFile:
+    """Test auto-detection of the newest output file."""
+
+    @pytest.mark.unit
+    def test_picks_most_recently_modified_file(self, tmp_path, monkeypatch):
+        """Test that modification time, not the name, decides which file is newest."""
+        monkeypatch.chdir(tmp_path)
+        for name, mtime in [('run_20250102.csv', 100), ('run_20250101.csv', 200), ('other.csv', 300)]:
+            (tmp_path / name).write_text('place_id\n')
+            os.utime(tmp_path / name, (mtime, mtime))
+
+        assert find_latest_file('run_') == 'run_20250101.csv'
+
+    @pytest.mark.unit
+    def test_returns_none_without_matches(self, tmp_path, monkeypatch):
+        """Test that None is returned when no file matches."""
+        monkeypatch.chdir(tmp_path)
+
+        assert find_latest_file('run_') is None
@@ -0,0 +1,197 @@
+"""
+Unit tests for the community locations extractor.
+"""
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+import pytest
+
+# Add the parent directory to sys.path so we can import the extractor
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.analyzers import community_extractor
+
+
+ZONE = {'name': 'Zone_A', 'location': (-6.2088, 106.8456)}
+
+
+def search_page(place_ids, next_page_token=None):
+    """Build a Nearby Search response holding the given place_ids."""
+    page = {'results': [{'place_id': place_id, 'name': place_id, 'types': ['store']} for place_id in place_ids]}
+    if next_page_token:
+        page['next_page_token'] = next_page_token
+    return page
+
+
+class TestResponseCache:
+    """Test the persistent API response cache."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Fixture providing a cache backed by a temporary database."""
+        cache = community_extractor.ResponseCache(str(tmp_path / 'cache.sqlite3'))
+        yield cache
+        cache.close()
+
+    @pytest.mark.unit
+    def test_cached_response_is_returned(self, cache):
+        """Test that a stored response is served and counted as a hit."""
+        cache.set('details', {'name': 'Posyandu'}, 'place_1')
+
+        assert cache.get('details', 'place_1') == {'name': 'Posyandu'}
+        assert cache.hits['details'] == 1
+
+    @pytest.mark.unit
+    def test_expired_response_is_not_returned(self, cache):
+        """Test that entries older than max_age are treated as missing."""
+        cache.set('details', {'name': 'Posyandu'}, 'place_1')
+
+        with patch('time.time', return_value=time.time() + cache.max_age + 60):
+            assert cache.get('details', 'place_1') is None
+        assert cache.hits['details'] == 0
+
+
+class TestFetchPlacesCaching:
+    """Test which Nearby Search page sets are cached."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Fixture providing a cache backed by a temporary database."""
+        cache = community_extractor.ResponseCache(str(tmp_path / 'cache.sqlite3'))
+        yield cache
+        cache.close()
+
+    def fetch(self, gmaps, cache, existing_ids=frozenset()):
+        with patch('time.sleep'):
+            return community_extractor.fetch_places_for_zone_and_keyword(
+                gmaps, 'posyandu', ZONE, 1000, existing_ids, cache=cache
+            )
+
+    def cached_pages(self, cache):
+        return cache.get('nearby', ZONE['name'], ZONE['location'], 'posyandu', 1000, 'id')
+
+    @pytest.mark.unit
+    def test_complete_search_is_cached(self, cache):
+        """Test that a search whose every page was fetched is cached and reused."""
+        gmaps = Mock()
+        gmaps.places_nearby.side_effect = [search_page(['p1'], 'token'), search_page(['p2'])]
+
+        places, api_calls, _ = self.fetch(gmaps, cache)
+        assert [place['place_id'] for place in places] == ['p1', 'p2']
+        assert api_calls == 2
+
+        places, api_calls, _ = self.fetch(gmaps, cache)
+        assert [place['place_id'] for place in places] == ['p1', 'p2']
+        assert api_calls == 0
+        assert gmaps.places_nearby.call_count == 2
+
+    @pytest.mark.unit
+    def test_pagination_error_is_not_cached(self, cache):
+        """Test that partial results after a failed page request are not cached."""
+        gmaps = Mock()
+        gmaps.places_nearby.side_effect = [search_page(['p1'], 'token'), Exception('INVALID_REQUEST')]
+
+        places, _, _ = self.fetch(gmaps, cache)
+
+        assert [place['place_id'] for place in places] == ['p1']
+        assert self.cached_pages(cache) is None
+
+    @pytest.mark.unit
+    def test_early_stop_on_known_places_is_not_cached(self, cache):
+        """Test that pages cut short by the existing-dataset check are not cached."""
+        gmaps = Mock()
+        gmaps.places_nearby.side_effect = [search_page(['known'], 'token'), search_page(['p2'])]
+        existing_ids = {community_extractor.place_id_hash('known')}
+
+        places, _, duplicates = self.fetch(gmaps, cache, existing_ids)
+
+        assert places == []
+        assert duplicates == 1
+        assert gmaps.places_nearby.call_count == 1
+        assert self.cached_pages(cache) is None
+
+
+class TestLoadSearchZones:
+    """Test search zone loading."""
+
+    @pytest.mark.unit
+    def test_failed_read_is_retried_on_next_call(self, tmp_path):
+        """Test that the fallback zones returned after a read error are not reused."""
+        zones_file = tmp_path / 'zones.csv'
+
+        fallback = community_extractor.load_search_zones(str(zones_file))
+        assert [zone['name'] for zone in fallback][0] == 'Central_Jakarta_Core'
+
+        zones_file.write_text('zone_name,center_latitude,center_longitude\nZone_A,-6.2,106.8\n')
+        zones = community_extractor.load_search_zones(str(zones_file))
+
+        assert zones == [{'name': 'Zone_A', 'location': (-6.2, 106.8)}]
+
+
+class TestResume:
+    """Test resuming an interrupted run from its output file."""
+
+    QUERY = {'keyword': 'posyandu', 'category': 'Community_Infrastructure', 'sub_category': 'Health_Center', 'radius': 1000}
+
+    @pytest.fixture
+    def gmaps(self, monkeypatch, tmp_path):
+        """Fixture running main() in tmp_path against a fake client with one zone and query."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('GOOGLE_MAPS_API_KEY', 'test_key')
+        monkeypatch.setattr(community_extractor, 'load_existing_place_ids', lambda: set())
+        monkeypatch.setattr(community_extractor, 'load_search_zones', lambda: [ZONE])
+        monkeypatch.setattr(community_extractor, 'get_community_search_queries', lambda: [self.QUERY])
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+
+        gmaps = Mock()
+        gmaps.places_nearby.return_value = search_page(['p1', 'p2', 'p3'])
+        gmaps.place.side_effect = lambda place_id, **kwargs: {
+            'result': {'place_id': place_id, 'name': place_id, 'geometry': {'location': {'lat': -6.2, 'lng': 106.8}}}
+        }
+        monkeypatch.setattr(community_extractor.googlemaps, 'Client', lambda key: gmaps)
+        return gmaps
+
+    @pytest.mark.unit
+    def test_partial_last_row_is_dropped(self, tmp_path):
+        """Test that a row cut off mid-write is removed and not counted as saved."""
+        output_file = tmp_path / 'out.csv'
+        output_file.write_bytes(b'place_id,name\r\np1,Posyandu\r\np2,Posy')
+
+        saved = community_extractor.load_saved_place_ids(str(output_file))
+
+        assert saved == {'p1'}
+        assert output_file.read_bytes() == b'place_id,name\r\np1,Posyandu\r\n'
+
+    @pytest.mark.unit
+    def test_resume_only_fetches_unsaved_places(self, gmaps, tmp_path):
+        """Test that a resumed run skips places already in the output and appends the rest."""
+        output_file = tmp_path / 'out.csv'
+        header = ','.join(community_extractor.OUTPUT_COLUMNS)
+        output_file.write_text(f'{header}\r\np1,Saved\r\np2,Cut', encoding='utf-8')
+
+        community_extractor.main(resume_file=str(output_file))
+
+        assert sorted(call.kwargs['place_id'] for call in gmaps.place.call_args_list) == ['p2', 'p3']
+        lines = output_file.read_text(encoding='utf-8').splitlines()
+        assert lines[0] == header
+        assert [line.split(',')[0] for line in lines[1:]] == ['p1', 'p2', 'p3']
+
+    @pytest.mark.unit
+    def test_rows_reach_the_file_during_the_run(self, gmaps, tmp_path, monkeypatch):
+        """Test that rows are flushed every FLUSH_EVERY places, not only at the end."""
+        monkeypatch.setattr(community_extractor, 'FLUSH_EVERY', 2)
+        gmaps.places_nearby.return_value = search_page(['p1', 'p2', 'p3', 'p4', 'p5'])
+        process = community_extractor.process_community_place_for_output
+        lines_on_disk = []
+
+        def process_and_read_output(*args, **kwargs):
+            output_file, = tmp_path.glob('jakarta_community_locations_*.csv')
+            lines_on_disk.append(len(output_file.read_text(encoding='utf-8').splitlines()))
+            return process(*args, **kwargs)
+        monkeypatch.setattr(community_extractor, 'process_community_place_for_output', process_and_read_output)
+
+        community_extractor.main()
+
+        # Header plus two rows after every second place
+        assert lines_on_disk == [0, 0, 3, 3, 5]
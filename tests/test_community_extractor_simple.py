@@ -0,0 +1,157 @@
+"""
+Unit tests for the simple community locations extractor.
+"""
+import csv
+import random
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+import googlemaps
+import pandas as pd
+import pytest
+
+# Add the parent directory to sys.path so we can import the extractor
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.analyzers import community_extractor_simple
+from src.utils.common import NUMERIC_DTYPES
+
+
+def per_row_popularity_score(rating, review_count):
+    """The per-row popularity formula add_popularity_scores replaced."""
+    if not rating or not review_count:
+        return 0.0
+    normalized_rating = (float(rating) - 1) / 4
+    log_reviews = min(1.0, int(review_count) / 1000)
+    return round(normalized_rating * log_reviews, 2)
+
+
+class TestPopularityScores:
+    """Test the vectorized popularity score."""
+
+    @pytest.mark.unit
+    def test_matches_per_row_formula(self):
+        """Test that every rating and review count scores as the per-row formula did."""
+        rows = [(rating / 10, reviews) for rating in range(10, 51) for reviews in range(0, 1101)]
+        df = pd.DataFrame(rows, columns=['rating', 'review_count'])
+        df = df.astype({col: NUMERIC_DTYPES[col] for col in df.columns})
+
+        scores = community_extractor_simple.add_popularity_scores(df)['popularity_score']
+
+        assert scores.tolist() == [per_row_popularity_score(rating, reviews) for rating, reviews in rows]
+
+    @pytest.mark.unit
+    def test_matches_per_row_formula_for_unrounded_ratings(self):
+        """Test parity for ratings with more decimals, as averages of a dataset have."""
+        rng = random.Random(0)
+        rows = [(round(rng.uniform(1, 5), rng.choice([2, 3])), rng.randint(1, 2000)) for _ in range(20000)]
+        df = pd.DataFrame(rows, columns=['rating', 'review_count'])
+        df = df.astype({col: NUMERIC_DTYPES[col] for col in df.columns})
+
+        scores = community_extractor_simple.add_popularity_scores(df)['popularity_score']
+
+        assert scores.tolist() == [per_row_popularity_score(rating, reviews) for rating, reviews in rows]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('rating, review_count, expected', [
+        (1.2, 100, 0.0),
+        (2.1, 1000, 0.28),
+        (4.5, 250, 0.22),
+    ])
+    def test_known_scores(self, rating, review_count, expected):
+        """Test scores that drifted by 0.01 when rating was stored as float32."""
+        df = pd.DataFrame({'rating': [rating], 'review_count': [review_count]})
+        df = df.astype({col: NUMERIC_DTYPES[col] for col in df.columns})
+
+        assert community_extractor_simple.add_popularity_scores(df)['popularity_score'][0] == expected
+
+    @pytest.mark.unit
+    def test_missing_inputs_score_zero(self):
+        """Test that places without a rating or reviews score 0.0."""
+        df = pd.DataFrame({'rating': [None, 4.0, 0.0], 'review_count': [10, None, 10]})
+        df = df.astype({col: NUMERIC_DTYPES[col] for col in df.columns})
+
+        assert community_extractor_simple.add_popularity_scores(df)['popularity_score'].tolist() == [0.0, 0.0, 0.0]
+
+
+class TestLoadSavedPlaceIds:
+    """Test the resume state read back from an output file."""
+
+    @pytest.mark.unit
+    def test_returns_place_ids_of_saved_rows(self, tmp_path):
+        """Test that every saved row's place_id is returned and blank ones are ignored."""
+        output_file = tmp_path / 'out.csv'
+        output_file.write_text('place_id,name\np1,Posyandu\n,Unknown\np2,Masjid\n', encoding='utf-8')
+
+        assert community_extractor_simple.load_saved_place_ids(str(output_file)) == {'p1', 'p2'}
+
+    @pytest.mark.unit
+    def test_partial_last_row_is_dropped(self, tmp_path):
+        """Test that a row cut off by a crash is removed before resuming."""
+        output_file = tmp_path / 'out.csv'
+        output_file.write_text('place_id,name\np1,Posyandu\np2,Mas', encoding='utf-8')
+
+        assert community_extractor_simple.load_saved_place_ids(str(output_file)) == {'p1'}
+        assert output_file.read_text(encoding='utf-8') == 'place_id,name\np1,Posyandu\n'
+
+
+class TestMain:
+    """Test main() end to end against a fake Google Maps client."""
+
+    ZONE = {'name': 'Zone_A', 'location': (-6.2088, 106.8456), 'radius': 1000}
+
+    @pytest.fixture
+    def gmaps(self, monkeypatch, tmp_path):
+        """Fixture running main() in tmp_path against a fake client with one zone and query."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('GOOGLE_MAPS_API_KEY', 'test_key')
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        monkeypatch.setattr(community_extractor_simple, 'load_search_zones', lambda: [self.ZONE])
+        monkeypatch.setattr(community_extractor_simple, 'get_community_queries_dataframe', lambda: pd.DataFrame(
+            [{'keyword': 'posyandu', 'category': 'Community_Infrastructure', 'sub_category': 'Health_Center'}]
+        ))
+
+        gmaps = Mock()
+        gmaps.places_nearby.return_value = {'results': [
+            {
+                'place_id': place_id,
+                'name': f'Posyandu {place_id}',
+                'types': ['health'],
+                'geometry': {'location': {'lat': -6.2, 'lng': 106.8}},
+                'vicinity': f'Jl. {place_id}',
+                'business_status': 'OPERATIONAL',
+                'rating': 4.5,
+                'user_ratings_total': 500,
+                'price_level': 1,
+                'opening_hours': {'open_now': False},
+            }
+            for place_id in ('p1', 'p2', 'p3')
+        ]}
+        monkeypatch.setattr(community_extractor_simple, 'GoogleMapsClient', lambda **kwargs: gmaps)
+        return gmaps
+
+    def run(self, tmp_path):
+        community_extractor_simple.main(use_cache=False)
+        output_file, = tmp_path.glob('jakarta_community_simple_*.csv')
+        with open(output_file, newline='', encoding='utf-8') as f:
+            return {row['place_id']: row for row in csv.DictReader(f)}
+
+    @pytest.mark.unit
+    def test_details_only_request_fields_missing_from_search(self, gmaps, tmp_path):
+        """Test that Place Details asks only for contact fields and the search values are kept."""
+        def place(place_id, fields, **kwargs):
+            if place_id == 'p3':
+                raise googlemaps.exceptions.ApiError('NOT_FOUND')
+            # p2 has none of the requested fields
+            return {'result': {'website': 'https://p1.id'} if place_id == 'p1' else {}}
+        gmaps.place.side_effect = place
+
+        rows = self.run(tmp_path)
+
+        assert gmaps.place.call_args.kwargs['fields'] == ['formatted_address', 'website', 'formatted_phone_number']
+        assert sorted(rows) == ['p1', 'p2']
+        assert rows['p1']['website'] == 'https://p1.id'
+        assert rows['p2']['rating'] == '4.5'
+        assert rows['p2']['review_count'] == '500'
+        assert rows['p2']['price_level'] == '$'
+        assert rows['p2']['is_open_now'] == 'False'
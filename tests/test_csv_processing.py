@@ -270,7 +270,24 @@ class TestCSVSanitization:
                 result = main.read_queries('test.csv')
                 
                 assert len(result.iloc[0]['category']) == 50
-    
+
+    @pytest.mark.unit
+    def test_csv_truncation_logged_once(self, caplog):
+        """Test that truncation is reported once per column, not per row."""
+        with patch('main.Path.exists', return_value=True):
+            with patch('pandas.read_csv') as mock_read_csv:
+                df = pd.DataFrame({
+                    'keyword': ['a' * 150] * 3 + ['short'],
+                    'category': ['Test'] * 4
+                })
+                mock_read_csv.return_value = df
+
+                result = main.read_queries('test.csv')
+
+                assert (result['keyword'].str.len() <= 100).all()
+                assert caplog.text.count("truncated") == 1
+                assert "3 input(s) truncated to 100 characters" in caplog.text
+
     @pytest.mark.unit
     def test_csv_handles_non_string_values(self):
         """Test handling of non-string values in CSV."""
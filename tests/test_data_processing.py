@@ -359,4 +359,44 @@ class TestExtractPlaceInfo:
         }
         
         result = main.extract_place_info(place_details_empty_hours, "Test")
-        assert result['is_open_now'] == ''
\ No newline at end of file
+        assert result['is_open_now'] == ''
+
+class TestBuildPlacesFrame:
+    """Test the column-wise place extraction used by main."""
+    
+    @pytest.fixture
+    def place_details_list(self):
+        """Fixture providing places covering the extract_place_info edge cases."""
+        return [
+            {
+                'place_id': 'complete',
+                'name': 'Jakarta <Vet> "Clinic"',
+                'formatted_address': ' 123 Jalan Sudirman; Jakarta ',
+                'geometry': {'location': {'lat': -6.2088, 'lng': 106.8456}},
+                'rating': 4.5,
+                'user_ratings_total': 128,
+                'website': 'https://jakartavetclinic.com',
+                'type': 'veterinary_care',
+                'opening_hours': {'open_now': False}
+            },
+            {'place_id': 'minimal', 'name': 'Minimal Clinic'},
+            {'place_id': 'bad_coords', 'name': 'x' * 250,
+             'geometry': {'location': {'lat': 91.0, 'lng': 106.8}}},
+            {'place_id': 'half_coords', 'geometry': {'location': {'lat': -6.2}},
+             'opening_hours': {}, 'user_ratings_total': 'many'},
+            {'place_id': 'edge_coords', 'geometry': {'location': {'lat': -90, 'lng': 180}}},
+        ]
+    
+    @pytest.mark.unit
+    def test_build_places_frame_matches_extract_place_info(self, place_details_list):
+        """Test that the frame holds the same values as per-place extraction."""
+        categories = ['Competitor', 'Lifestyle_Proxy', 'Competitor', 'Test', 'Test']
+        
+        df = main.build_places_frame(place_details_list, categories)
+        
+        assert list(df.columns) == main.PLACE_COLUMNS
+        for row, details, category in zip(df.to_dict('records'), place_details_list, categories):
+            expected = main.extract_place_info(details, category)
+            # Missing values are NaN in the frame and '' per place
+            actual = {key: '' if value != value else value for key, value in row.items()}
+            assert actual == expected
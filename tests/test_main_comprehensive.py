@@ -0,0 +1,163 @@
+"""
+Unit tests for the comprehensive grid search runner.
+"""
+import csv
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+import googlemaps
+import pytest
+
+# Add the parent directory to sys.path so we can import the runner
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.runners import main_comprehensive
+
+
+CENTER = (-6.2088, 106.8456)
+
+
+def nearby_result(place_id):
+    """A Nearby Search result, which already carries rating and opening hours."""
+    return {
+        'place_id': place_id,
+        'name': f'Klinik Hewan {place_id}',
+        'types': ['veterinary_care'],
+        'geometry': {'location': {'lat': CENTER[0], 'lng': CENTER[1]}},
+        'vicinity': f'Jl. {place_id}',
+        'business_status': 'OPERATIONAL',
+        'rating': 4.5,
+        'user_ratings_total': 120,
+        'price_level': 2,
+        'opening_hours': {'open_now': True},
+    }
+
+
+NESTED_ZONES = [
+    ('Zone_B', *CENTER, 5000),
+    ('Zone_A', *CENTER, 20000),
+    ('Zone_C', *CENTER, 1000),
+]
+
+
+class TestFindContainingZones:
+    """Test zone containment."""
+
+    @pytest.mark.unit
+    def test_nested_zones(self):
+        """Test that every zone lists all the zones it lies in."""
+        zones = [{'name': name, 'location': (lat, lng), 'radius': radius} for name, lat, lng, radius in NESTED_ZONES]
+
+        assert main_comprehensive.find_containing_zones(zones) == [[1], [], [0, 1]]
+
+    @pytest.mark.unit
+    def test_identical_zones_contain_only_the_later_one(self):
+        """Test that of two identical zones only the earlier one is the container."""
+        zone = {'name': 'Zone_A', 'location': CENTER, 'radius': 1000}
+
+        assert main_comprehensive.find_containing_zones([zone, dict(zone)]) == [[], [0]]
+
+    @pytest.mark.unit
+    def test_overlapping_zones_do_not_contain_each_other(self):
+        """Test that zones that only overlap are both searched."""
+        zones = [
+            {'name': 'Zone_A', 'location': CENTER, 'radius': 1000},
+            {'name': 'Zone_B', 'location': (CENTER[0], CENTER[1] + 0.01), 'radius': 1000},
+        ]
+
+        assert main_comprehensive.find_containing_zones(zones) == [[], []]
+
+
+class TestMain:
+    """Test main() end to end against a fake Google Maps client."""
+
+    @pytest.fixture
+    def gmaps(self, monkeypatch, tmp_path):
+        """Fixture running main() in tmp_path against a fake client."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('GOOGLE_MAPS_API_KEY', 'test_key')
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+
+        gmaps = Mock()
+        gmaps.places_nearby.side_effect = lambda keyword, location, radius, **kwargs: {
+            'results': [nearby_result(f'{keyword}_{radius}')]
+        }
+        gmaps.place.side_effect = lambda place_id, fields, **kwargs: {
+            'result': {field: f'{field} of {place_id}' for field in fields}
+        }
+        monkeypatch.setattr(main_comprehensive.googlemaps, 'Client', lambda **kwargs: gmaps)
+        return gmaps
+
+    def run(self, tmp_path, zones, use_cache=False):
+        zones_file = tmp_path / 'zones.csv'
+        with open(zones_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['zone_name', 'latitude', 'longitude', 'radius'])
+            writer.writerows(zones)
+        queries_file = tmp_path / 'queries.csv'
+        queries_file.write_text('keyword,category,sub_category\nklinik hewan,Competitor,Clinic_General\n')
+
+        output_file = main_comprehensive.main(str(zones_file), str(queries_file), use_cache=use_cache)
+        with open(output_file, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    @pytest.mark.unit
+    def test_details_only_request_fields_missing_from_search(self, gmaps, tmp_path):
+        """Test that Place Details asks only for contact fields and search values are kept."""
+        rows = self.run(tmp_path, [('Zone_A', *CENTER, 1000)])
+
+        assert gmaps.place.call_args.kwargs['fields'] == ['formatted_address', 'website', 'formatted_phone_number']
+        assert len(rows) == 1
+        assert rows[0]['rating'] == '4.5'
+        assert rows[0]['review_count'] == '120'
+        assert rows[0]['price_level'] == '$$'
+        assert rows[0]['is_open_now'] == 'True'
+        assert rows[0]['website'] == 'website of klinik hewan_1000'
+
+    @pytest.mark.unit
+    def test_zones_nested_in_a_complete_search_are_skipped(self, gmaps, tmp_path):
+        """Test that zones inside a zone whose search returned every match are not searched."""
+        rows = self.run(tmp_path, NESTED_ZONES)
+
+        assert [call.kwargs['radius'] for call in gmaps.places_nearby.call_args_list] == [20000]
+        assert [row['search_zone'] for row in rows] == ['Zone_A']
+
+    @pytest.mark.unit
+    def test_zones_nested_in_a_capped_search_are_searched(self, gmaps, tmp_path):
+        """Test that a full last page from the container leaves the nested zones to their own search."""
+        gmaps.places_nearby.side_effect = lambda keyword, location, radius, **kwargs: {
+            'results': [nearby_result(f'{radius}_{i}') for i in range(main_comprehensive.SEARCH_PAGE_SIZE)]
+        }
+
+        rows = self.run(tmp_path, NESTED_ZONES)
+
+        assert sorted(call.kwargs['radius'] for call in gmaps.places_nearby.call_args_list) == [1000, 5000, 20000]
+        assert len(rows) == 3 * main_comprehensive.SEARCH_PAGE_SIZE
+
+    @pytest.mark.unit
+    def test_cached_details_are_not_fetched_again(self, gmaps, tmp_path):
+        """Test that a second run reads Place Details from the response cache."""
+        first = self.run(tmp_path, [('Zone_A', *CENTER, 1000)], use_cache=True)
+        second = self.run(tmp_path, [('Zone_A', *CENTER, 1000)], use_cache=True)
+
+        assert gmaps.place.call_count == 1
+        assert [row['website'] for row in second] == [row['website'] for row in first]
+
+    @pytest.mark.unit
+    def test_place_without_contact_fields_is_kept(self, gmaps, tmp_path):
+        """Test that an empty details result keeps the place and a failed lookup drops it."""
+        gmaps.places_nearby.side_effect = lambda keyword, location, radius, **kwargs: {
+            'results': [nearby_result('p1'), nearby_result('p2')]
+        }
+
+        def place(place_id, fields, **kwargs):
+            if place_id == 'p2':
+                raise googlemaps.exceptions.ApiError('NOT_FOUND')
+            return {'result': {}}
+        gmaps.place.side_effect = place
+
+        rows = self.run(tmp_path, [('Zone_A', *CENTER, 1000)])
+
+        assert [row['place_id'] for row in rows] == ['p1']
+        assert rows[0]['rating'] == '4.5'
+        assert rows[0]['website'] == ''